@@ -1,116 +1,233 @@
-import json
 import os
+import re
+import time
 import asyncio
 from pathlib import Path
-from datetime import datetime, timedelta
-from typing import Dict, List, Optional, Set
-from collections import defaultdict
+from typing import Dict, List, Set, Tuple
 
-from nonebot import on_command, get_driver, require, get_bot
+from nonebot import on_command, on_notice, get_driver, get_plugin_config, require, get_bot, get_bots
 from nonebot.adapters import Event
-from nonebot.adapters.onebot.v11 import Bot, GroupMessageEvent, MessageSegment
+from nonebot.adapters.onebot.v11 import (
+    Bot,
+    GroupAdminNoticeEvent,
+    GroupDecreaseNoticeEvent,
+    GroupIncreaseNoticeEvent,
+    GroupMessageEvent,
+    Message,
+    MessageSegment,
+    NoticeEvent,
+)
 from nonebot.permission import SUPERUSER
 from nonebot.rule import to_me
 from nonebot.params import CommandArg
 from nonebot.log import logger
+from nonebot.message import event_preprocessor
+
+from .activity import ActivityTracker
+from .config import Config
+from .dispatch import ApiDispatcher
+from .kick import KickExecutor, KickJob, KickJobStore, KickResult, run_kick_job
+from .members import MemberListCache
+from .scan import InactiveScanner, ScanResult, days_since, display_name
+from .storage import create_data_manager
+
+plugin_config = get_plugin_config(Config)
+driver = get_driver()
 
 # 数据存储路径
 DATA_DIR = Path("data/nonebot_plugin_group_member_manager")
-DATA_FILE = DATA_DIR / "data.json"
 
-# 确保数据目录存在
-DATA_DIR.mkdir(parents=True, exist_ok=True)
 
+# 创建数据管理器实例, 数据在启动时读取, 导入本插件不会访问磁盘
+data_manager = create_data_manager(DATA_DIR, plugin_config)
+# 获取成员列表、踢人、验证白名单成员等 API 调用按目标群轮流排队
+api_dispatcher = ApiDispatcher(plugin_config.gmm_api_rate, plugin_config.gmm_api_concurrency)
+member_cache = MemberListCache(
+    plugin_config.gmm_member_cache_ttl,
+    plugin_config.gmm_member_cache_size,
+    plugin_config.gmm_roster_track_notices,
+    dispatcher=api_dispatcher,
+)
+kick_executor = KickExecutor(
+    plugin_config.gmm_kick_rate,
+    plugin_config.gmm_kick_concurrency,
+    min_rate=plugin_config.gmm_kick_min_rate,
+    max_rate=plugin_config.gmm_kick_max_rate,
+    step=plugin_config.gmm_kick_rate_step,
+    timeout=plugin_config.gmm_kick_timeout,
+    backoff_retcodes=plugin_config.gmm_kick_backoff_retcodes,
+    dispatcher=api_dispatcher,
+)
+kick_job_store = KickJobStore(DATA_DIR / "jobs")
+activity_tracker = ActivityTracker(
+    DATA_DIR / "activity.json", plugin_config.gmm_journal_compact_threshold
+)
+scanner = InactiveScanner(
+    data_manager, member_cache, activity_tracker, plugin_config.gmm_scan_result_ttl
+)
 
-class DataManager:
-    """数据管理类"""
-    
-    def __init__(self):
-        self.data = self.load_data()
-    
-    def load_data(self) -> Dict:
-        """加载数据"""
-        if not DATA_FILE.exists():
-            return {
-                "bindings": {},  # 格式: {"当前群号": {"target_group": "目标群号", "inactive_months": 6}}
-                "whitelist": defaultdict(set),  # 格式: {"群号": {qq号集合}}
-            }
-        
+
+def refresh_activity_groups():
+    """按当前绑定更新需要记录发言的目标群"""
+    activity_tracker.set_groups(
+        int(binding["target_group"]) for _, binding in data_manager.iter_bindings()
+    )
+
+
+@driver.on_startup
+async def _load_data():
+    """启动时在线程中创建数据目录并读取数据"""
+    # 确保数据目录存在
+    await asyncio.to_thread(DATA_DIR.mkdir, parents=True, exist_ok=True)
+    await asyncio.gather(data_manager.load(), activity_tracker.load())
+    refresh_activity_groups()
+
+
+@driver.on_shutdown
+async def _flush_data():
+    """关闭时写入尚未保存的数据"""
+    await data_manager.save()
+    data_manager.close()
+    await activity_tracker.flush()
+
+
+async def _roster_resync_loop():
+    """定期完整同步成员名单, 修正增量更新可能产生的偏差"""
+    interval = plugin_config.gmm_roster_resync_interval
+    while True:
+        await asyncio.sleep(min(interval, 600))
         try:
-            with open(DATA_FILE, 'r', encoding='utf-8') as f:
-                data = json.load(f)
-                # 转换whitelist为set类型
-                if "whitelist" in data:
-                    data["whitelist"] = {k: set(v) for k, v in data["whitelist"].items()}
-                else:
-                    data["whitelist"] = defaultdict(set)
-                return data
+            await member_cache.resync_stale(interval)
         except Exception as e:
-            logger.error(f"加载数据失败: {e}")
-            return {
-                "bindings": {},
-                "whitelist": defaultdict(set),
-            }
+            logger.error(f"同步成员名单失败: {e}")
+
+
+# 后台任务, 保留引用避免被回收
+background_tasks: Set[asyncio.Task] = set()
+
+
+def run_in_background(coro) -> asyncio.Task:
+    task = asyncio.create_task(coro)
+    background_tasks.add(task)
+    task.add_done_callback(background_tasks.discard)
+    return task
+
+
+async def _activity_flush_loop():
+    """定期批量写入发言记录"""
+    while True:
+        await asyncio.sleep(plugin_config.gmm_activity_save_interval)
+        await activity_tracker.flush()
+
+
+@driver.on_startup
+async def _start_background_tasks():
+    if plugin_config.gmm_roster_track_notices:
+        run_in_background(_roster_resync_loop())
+    run_in_background(_activity_flush_loop())
+
+
+def format_kick_result(result: KickResult) -> str:
+    message = f"删除不活跃成员完成\n"
+    message += f"成功删除: {len(result.removed)} 人\n"
+    if result.failed:
+        message += f"删除失败: {len(result.failed)} 人"
+    return message
+
+
+# 正在执行的删除任务, 目标群 -> 任务, 同一目标群同时只执行一个任务
+active_kick_jobs: Dict[int, KickJob] = {}
+kick_tasks: Dict[int, asyncio.Task] = {}
+
+
+async def _run_kick_job(bot: Bot, job: KickJob) -> KickResult:
+    def on_kicked(user_id: int):
+        # 不跟踪群通知时缓存的名单也要移除已踢出的成员, 否则有效期内会再次被列出
+        roster = member_cache.cached(bot.self_id, job.target_group)
+        if roster is not None:
+            roster.remove(user_id)
+        activity_tracker.forget(job.target_group, user_id)
+
+    try:
+        result = await run_kick_job(kick_executor, kick_job_store, bot, job, on_kicked=on_kicked)
+    finally:
+        active_kick_jobs.pop(job.target_group, None)
+        kick_tasks.pop(job.target_group, None)
+    logger.info(f"群 {job.target_group} 删除完成, 当前踢人速率 {kick_executor.rate:.2f} 次/秒")
+    return result
+
+
+async def execute_kick_job(bot: Bot, job: KickJob) -> KickResult:
+    """执行删除任务, 踢出的成员同时从缓存的名单中移除
+
+    目标群已有任务在执行时不再启动新任务, 而是等待正在执行的任务并返回它的结果。
+    """
+    task = kick_tasks.get(job.target_group)
+    if task is None:
+        active_kick_jobs[job.target_group] = job
+        task = asyncio.create_task(_run_kick_job(bot, job))
+        kick_tasks[job.target_group] = task
+    # 某个等待者被取消时不影响任务本身
+    return await asyncio.shield(task)
+
+
+async def _resume_kick_job(bot: Bot, job: KickJob):
+    try:
+        result = await execute_kick_job(bot, job)
+        await bot.send_group_msg(
+            group_id=job.report_group,
+            message="(重启后继续执行)\n" + format_kick_result(result),
+        )
+    except Exception as e:
+        logger.error(f"继续删除任务失败: {e}")
+
+
+@driver.on_bot_connect
+async def _resume_kick_jobs(bot: Bot):
+    """机器人连接后继续执行重启前未完成的删除任务"""
+    for job in await kick_job_store.load_all():
+        if job.self_id == bot.self_id and job.target_group not in active_kick_jobs:
+            logger.info(f"继续群 {job.target_group} 的删除任务, 剩余 {len(job.pending())} 人")
+            run_in_background(_resume_kick_job(bot, job))
+
+
+@event_preprocessor
+async def _record_activity(event: Event):
+    """记录目标群成员的发言时间, 每条群消息都会经过这里, 需保持轻量"""
+    if isinstance(event, GroupMessageEvent):
+        activity_tracker.record(event.group_id, event.user_id, event.time)
+
+
+# 根据群通知更新缓存的成员名单
+roster_notice = on_notice(priority=1, block=False)
+
+
+@roster_notice.handle()
+async def handle_roster_notice(event: NoticeEvent):
+    """成员变动时增量更新名单"""
+    group_id = getattr(event, "group_id", None)
+    if group_id is None:
+        return
+    if isinstance(event, GroupDecreaseNoticeEvent) and event.user_id != event.self_id:
+        # 不论是否缓存名单, 退群成员的发言记录都不再需要
+        activity_tracker.forget(group_id, event.user_id)
+    roster = member_cache.peek(str(event.self_id), group_id)
+    if roster is None:
+        return
     
-    def save_data(self):
-        """保存数据"""
-        try:
-            # 转换set为list用于JSON序列化
-            save_data = self.data.copy()
-            save_data["whitelist"] = {k: list(v) for k, v in self.data["whitelist"].items()}
-            
-            with open(DATA_FILE, 'w', encoding='utf-8') as f:
-                json.dump(save_data, f, ensure_ascii=False, indent=2)
-        except Exception as e:
-            logger.error(f"保存数据失败: {e}")
-    
-    def bind_group(self, current_group: str, target_group: str) -> bool:
-        """绑定群聊"""
-        self.data["bindings"][current_group] = {
-            "target_group": target_group,
-            "inactive_months": 6  # 默认6个月
-        }
-        self.save_data()
-        return True
-    
-    def unbind_group(self, current_group: str) -> bool:
-        """取消绑定"""
-        if current_group in self.data["bindings"]:
-            target_group = self.data["bindings"][current_group]["target_group"]
-            del self.data["bindings"][current_group]
-            # 删除对应的白名单
-            if target_group in self.data["whitelist"]:
-                del self.data["whitelist"][target_group]
-            self.save_data()
-            return True
-        return False
-    
-    def set_inactive_months(self, current_group: str, months: int) -> bool:
-        """设定不活跃月数"""
-        if current_group in self.data["bindings"]:
-            self.data["bindings"][current_group]["inactive_months"] = months
-            self.save_data()
-            return True
-        return False
-    
-    def get_binding(self, current_group: str) -> Optional[Dict]:
-        """获取绑定信息"""
-        return self.data["bindings"].get(current_group)
-    
-    def add_whitelist(self, group_id: str, user_id: str):
-        """添加白名单"""
-        if group_id not in self.data["whitelist"]:
-            self.data["whitelist"][group_id] = set()
-        self.data["whitelist"][group_id].add(user_id)
-        self.save_data()
-    
-    def get_whitelist(self, group_id: str) -> Set[str]:
-        """获取白名单"""
-        return self.data["whitelist"].get(group_id, set())
-
-
-# 创建数据管理器实例
-data_manager = DataManager()
+    if isinstance(event, GroupIncreaseNoticeEvent):
+        roster.add(event.user_id, event.time)
+    elif isinstance(event, GroupDecreaseNoticeEvent):
+        if event.user_id == event.self_id:
+            # 机器人自己退出了群
+            member_cache.invalidate(group_id)
+        else:
+            roster.remove(event.user_id)
+    elif isinstance(event, GroupAdminNoticeEvent):
+        roster.update(event.user_id, role="admin" if event.sub_type == "set" else "member")
+    elif event.notice_type == "group_card":
+        # 群名片变更不是 OneBot v11 标准事件, 字段由协议端扩展提供
+        roster.update(event.user_id, card=getattr(event, "card_new", ""))
 
 # 命令处理器
 bind_group = on_command("gmm绑定主群", permission=SUPERUSER, priority=5)
@@ -120,6 +237,10 @@ check_inactive = on_command("gmm查看不活跃成员", priority=5)
 add_whitelist = on_command("gmm设定白名单", priority=5)
 remove_inactive = on_command("gmm删除不活跃成员", priority=5)
 remove_whitelist = on_command("gmm删除白名单", permission=SUPERUSER, priority=5)
+cache_status = on_command("gmm缓存状态", permission=SUPERUSER, priority=5)
+dispatch_status = on_command("gmm调度状态", permission=SUPERUSER, priority=5)
+kick_status = on_command("gmm删除状态", priority=5)
+inactive_histogram = on_command("gmm不活跃分布", priority=5)
 
 @bind_group.handle()
 async def handle_bind_group(bot: Bot, event: GroupMessageEvent, args=CommandArg()):
@@ -140,7 +261,8 @@ async def handle_bind_group(bot: Bot, event: GroupMessageEvent, args=CommandArg(
             await bind_group.send(f"群号 {target_group} 不存在或机器人不在该群中")
             return
         
-        if data_manager.bind_group(current_group, target_group):
+        if await data_manager.bind_group(current_group, target_group):
+            refresh_activity_groups()
             await bind_group.send(f"成功绑定群 {group_info['group_name']}({target_group})")
         else:
             await bind_group.send("绑定失败")
@@ -158,7 +280,8 @@ async def handle_unbind_group(bot: Bot, event: GroupMessageEvent):
         await unbind_group.send("当前群未绑定任何主群")
         return
     
-    if data_manager.unbind_group(current_group):
+    if await data_manager.unbind_group(current_group):
+        refresh_activity_groups()
         await unbind_group.send(f"已取消绑定群 {binding['target_group']}，白名单已清空")
     else:
         await unbind_group.send("取消绑定失败")
@@ -180,7 +303,7 @@ async def handle_set_inactive(bot: Bot, event: GroupMessageEvent, args=CommandAr
             
         current_group = str(event.group_id)
         
-        if data_manager.set_inactive_months(current_group, months):
+        if await data_manager.set_inactive_months(current_group, months):
             await set_inactive.send(f"已设定不活跃判定月数为 {months} 个月")
         else:
             await set_inactive.send("当前群未绑定主群，请先绑定主群")
@@ -188,9 +311,80 @@ async def handle_set_inactive(bot: Bot, event: GroupMessageEvent, args=CommandAr
         await set_inactive.send("请输入有效的数字")
 
 
+def render_inactive_pages(
+    inactive_members: List[Tuple[int, Dict]],
+    inactive_months: int,
+    now: int,
+    page_size: int,
+    summary: str = "",
+) -> List[str]:
+    """把 (最后发言时间, 成员) 列表按每页 ``page_size`` 人渲染为文本, ``summary`` 附在第一页开头"""
+    total_pages = (len(inactive_members) + page_size - 1) // page_size
+    pages = []
+    
+    for i in range(0, len(inactive_members), page_size):
+        batch = inactive_members[i:i + page_size]
+        page_num = i // page_size + 1
+        
+        message = ""
+        if i == 0: 
+            message += f"不活跃判定: {inactive_months}个月\n"
+            if summary:
+                message += summary + "\n"
+        message += f"不活跃成员列表 ({page_num}/{total_pages}):\n"
+        message += "=" * 20 + "\n"
+        
+        for last_sent_time, member in batch:
+            message += f"{display_name(member)} ({member['user_id']})\n"
+            message += f"最后发言: {days_since(now, last_sent_time)}天前\n"
+            message += "-" * 20 + "\n"
+        
+        pages.append(message.strip())
+    return pages
+
+
+async def send_inactive_report(
+    bot: Bot,
+    group_id: int,
+    inactive_members: List[Tuple[int, Dict]],
+    inactive_months: int,
+    now: int,
+    summary: str = "",
+):
+    """发送不活跃成员列表
+
+    优先以一条合并转发消息发送, 协议端不支持时退回逐条发送。
+    """
+    if plugin_config.gmm_report_forward:
+        pages = render_inactive_pages(
+            inactive_members, inactive_months, now, plugin_config.gmm_forward_node_size, summary
+        )
+        nodes = [
+            {
+                "type": "node",
+                "data": {"name": "群成员管理", "uin": bot.self_id, "content": page},
+            }
+            for page in pages
+        ]
+        try:
+            await bot.send_group_forward_msg(group_id=group_id, messages=nodes)
+            return
+        except Exception as e:
+            logger.warning(f"发送合并转发消息失败, 改为逐条发送: {e}")
+    
+    # 分批发送，每批5人
+    pages = render_inactive_pages(inactive_members, inactive_months, now, 5, summary)
+    for i, page in enumerate(pages):
+        await bot.send_group_msg(group_id=group_id, message=page)
+        
+        # 如果不是最后一批，等待3秒
+        if i + 1 < len(pages):
+            await asyncio.sleep(3)
+
+
 @check_inactive.handle()
-async def handle_check_inactive(bot: Bot, event: GroupMessageEvent):
-    """查看不活跃成员"""
+async def handle_check_inactive(bot: Bot, event: GroupMessageEvent, args=CommandArg()):
+    """查看不活跃成员, 可指定只看最久未发言的N人及页码"""
     current_group = str(event.group_id)
     binding = data_manager.get_binding(current_group)
     
@@ -198,82 +392,201 @@ async def handle_check_inactive(bot: Bot, event: GroupMessageEvent):
         await check_inactive.send("当前群未绑定主群，请先绑定主群")
         return
     
-    target_group = binding["target_group"]
+    try:
+        numbers = [int(arg) for arg in str(args).split()]
+    except ValueError:
+        await check_inactive.send("请输入有效的数字, 格式: gmm查看不活跃成员 [人数] [页码]")
+        return
+    if len(numbers) > 2 or any(n <= 0 for n in numbers):
+        await check_inactive.send("格式: gmm查看不活跃成员 [人数] [页码], 人数和页码须大于0")
+        return
+    page_size = numbers[0] if numbers else None
+    page = numbers[1] if len(numbers) > 1 else 1
+    
+    target_group = int(binding["target_group"])
     inactive_months = binding["inactive_months"]
-    whitelist = data_manager.get_whitelist(target_group)
     
     try:
-        # 获取群成员列表
-        member_list = await bot.get_group_member_list(group_id=int(target_group))
-        
-        # 计算不活跃时间阈值
-        threshold_date = datetime.now() - timedelta(days=30 * inactive_months)
-        
-        inactive_members = []
-        
-        for member in member_list:
-            user_id = str(member["user_id"])
-            
-            # 跳过白名单用户和管理员
-            if user_id in whitelist or member["role"] in ["owner", "admin"]:
-                continue
-            
-            # 检查最后发言时间
-            last_sent_time = datetime.fromtimestamp(member["last_sent_time"])
-            
-            if last_sent_time < threshold_date:
-                nickname = member.get("nickname", "")
-                card = member.get("card", "")
-                display_name = card if card else nickname
-                inactive_members.append({
-                    "user_id": user_id,
-                    "display_name": display_name,
-                    "last_sent_time": last_sent_time
-                })
+        if page_size is None:
+            # 查看完整名单时重新扫描, 结果留给随后的删除使用
+            result = await scanner.scan(bot, target_group, inactive_months)
+            candidates = result.candidates
+            summary = ""
+        else:
+            # 只选出前 页码*人数 人, 不对全部不活跃成员排序
+            result = await scanner.scan(bot, target_group, inactive_months, page * page_size)
+            start = (page - 1) * page_size
+            candidates = result.candidates[start:]
+            summary = f"共 {result.inactive_count} 人, 第 {start + 1}-{start + len(candidates)} 名"
         
-        if not inactive_members:
+        if not result.candidates:
             await check_inactive.send("没有找到不活跃成员")
             return
+        if not candidates:
+            await check_inactive.send(f"共 {result.inactive_count} 名不活跃成员, 第 {page} 页没有内容")
+            return
         
-        # 按最后发言时间排序
-        inactive_members.sort(key=lambda x: x["last_sent_time"])
-
-        # 分批发送，每批5人
-        batch_size = 5
-        total_batches = (len(inactive_members) + batch_size - 1) // batch_size
-        
-        for i in range(0, len(inactive_members), batch_size):
-            batch = inactive_members[i:i + batch_size]
-            batch_num = i // batch_size + 1
-            
-            message = ""
-            if i == 0: 
-                message += f"不活跃判定: {inactive_months}个月\n"
-            message += f"不活跃成员列表 ({batch_num}/{total_batches}):\n"
-            message += "=" * 20 + "\n"
-            
-            for member in batch:
-                days_ago = (datetime.now() - member["last_sent_time"]).days
-                message += f"{member['display_name']} ({member['user_id']})\n"
-                message += f"最后发言: {days_ago}天前\n"
-                message += "-" * 20 + "\n"
-            
-            await check_inactive.send(message.strip())
-            
-            # 如果不是最后一批，等待2-5秒
-            if i + batch_size < len(inactive_members):
-                await asyncio.sleep(3)  # 等待3秒
+        await send_inactive_report(
+            bot, event.group_id, candidates, inactive_months, result.scanned_at, summary
+        )
                 
     except Exception as e:
         logger.error(f"获取不活跃成员失败: {e}")
         await check_inactive.send(f"获取不活跃成员失败: {str(e)}")
 
 
+@inactive_histogram.handle()
+async def handle_inactive_histogram(bot: Bot, event: GroupMessageEvent):
+    """查看不同判定月数下的不活跃人数"""
+    current_group = str(event.group_id)
+    binding = data_manager.get_binding(current_group)
+    
+    if not binding:
+        await inactive_histogram.send("当前群未绑定主群，请先绑定主群")
+        return
+    
+    inactive_months = binding["inactive_months"]
+    
+    try:
+        counts = await scanner.histogram(bot, int(binding["target_group"]), range(1, 25))
+    except Exception as e:
+        logger.error(f"统计不活跃分布失败: {e}")
+        await inactive_histogram.send(f"统计不活跃分布失败: {str(e)}")
+        return
+    
+    message = "不同判定月数下的不活跃人数:\n"
+    message += "=" * 20 + "\n"
+    for months, count in counts:
+        mark = " (当前)" if months == inactive_months else ""
+        message += f"{months}个月: {count} 人{mark}\n"
+    
+    await inactive_histogram.send(message.strip())
+
+
+def format_scan_digest(target_group: int, result: ScanResult) -> str:
+    """定期检查发送给管理群的摘要"""
+    message = f"定期检查: 主群 {target_group} 共 {result.inactive_count} 名不活跃成员"
+    message += f" (判定 {result.inactive_months} 个月)\n"
+    message += f"最久未发言的 {len(result.candidates)} 人:\n"
+    message += "=" * 20 + "\n"
+    for last_sent_time, member in result.candidates:
+        message += f"{display_name(member)} ({member['user_id']}) "
+        message += f"{days_since(result.scanned_at, last_sent_time)}天前\n"
+    message += "=" * 20 + "\n"
+    message += "发送 gmm查看不活跃成员 查看完整名单"
+    return message
+
+
+async def scheduled_scan():
+    """检查所有绑定的目标群, 向各自的管理群发送不活跃成员摘要
+
+    各目标群错开 ``gmm_scheduled_scan_stagger`` 秒开始, 同时最多检查
+    ``gmm_scheduled_scan_concurrency`` 个群; 多个管理群绑定同一目标群时只检查一次。
+    连接了多个机器人时, 优先使用已缓存该群名单的机器人, 失败时依次换用其他机器人。
+    """
+    bots = [bot for bot in get_bots().values() if isinstance(bot, Bot)]
+    if not bots:
+        return
+    
+    # (目标群, 判定月数) -> 管理群列表
+    targets: Dict[Tuple[int, int], List[int]] = {}
+    for current_group, binding in data_manager.iter_bindings():
+        key = (int(binding["target_group"]), binding["inactive_months"])
+        targets.setdefault(key, []).append(int(current_group))
+    
+    semaphore = asyncio.Semaphore(max(1, plugin_config.gmm_scheduled_scan_concurrency))
+    
+    async def scan_target(delay: float, target_group: int, inactive_months: int, groups: List[int]):
+        await asyncio.sleep(delay)
+        # 已缓存名单的机器人一定在该群中, 排在前面
+        ordered = sorted(bots, key=lambda bot: member_cache.cached(bot.self_id, target_group) is None)
+        async with semaphore:
+            for bot in ordered:
+                try:
+                    result = await scanner.scan(
+                        bot, target_group, inactive_months,
+                        plugin_config.gmm_scheduled_scan_digest_size,
+                    )
+                    break
+                except Exception as e:
+                    error = e
+            else:
+                logger.error(f"定期检查群 {target_group} 失败: {error}")
+                return
+        if not result.inactive_count:
+            return
+        message = format_scan_digest(target_group, result)
+        senders = [bot] + [other for other in ordered if other is not bot]
+        for group_id in groups:
+            for sender in senders:
+                try:
+                    await sender.send_group_msg(group_id=group_id, message=message)
+                    break
+                except Exception as e:
+                    error = e
+            else:
+                logger.error(f"向群 {group_id} 发送定期检查结果失败: {error}")
+    
+    await asyncio.gather(*(
+        scan_target(i * plugin_config.gmm_scheduled_scan_stagger, target_group, months, groups)
+        for i, ((target_group, months), groups) in enumerate(targets.items())
+    ))
+
+
+if plugin_config.gmm_scheduled_scan:
+    require("nonebot_plugin_apscheduler")
+    from nonebot_plugin_apscheduler import scheduler
+    
+    scheduler.add_job(
+        scheduled_scan,
+        "interval",
+        hours=plugin_config.gmm_scheduled_scan_interval,
+        id="gmm_scheduled_scan",
+        replace_existing=True,
+    )
+
+
+# 只接受 ASCII 数字, str.isdigit 会把 "²" 等字符也当作数字
+QQ_PATTERN = re.compile(r"\d+", re.ASCII)
+
+
+def parse_user_ids(args: Message) -> Tuple[List[int], List[str]]:
+    """从命令参数中取出QQ号, 支持空格或逗号分隔以及@成员, 返回 (QQ号, 无法识别的内容)"""
+    user_ids: List[int] = []
+    invalid: List[str] = []
+    for segment in args:
+        if segment.type == "at":
+            qq = str(segment.data.get("qq"))
+            if QQ_PATTERN.fullmatch(qq):
+                user_ids.append(int(qq))
+        elif segment.type == "text":
+            for token in re.split(r"[\s,，、]+", segment.data.get("text", "")):
+                if not token:
+                    continue
+                if QQ_PATTERN.fullmatch(token):
+                    user_ids.append(int(token))
+                else:
+                    invalid.append(token)
+    # 去重并保持输入顺序
+    return list(dict.fromkeys(user_ids)), invalid
+
+
+def format_user_list(user_ids: List[int], roster=None, limit: int = 20) -> str:
+    """列出QQ号, 名单中有该成员时附带群名片或昵称"""
+    names = []
+    for user_id in user_ids[:limit]:
+        member = roster.members.get(user_id) if roster is not None else None
+        names.append(f"{display_name(member)}({user_id})" if member else str(user_id))
+    if len(user_ids) > limit:
+        names.append(f"等 {len(user_ids)} 人")
+    return "、".join(names)
+
+
 @add_whitelist.handle()
 async def handle_add_whitelist(bot: Bot, event: GroupMessageEvent, args=CommandArg()):
-    """设定白名单"""
-    args_text = str(args).strip()
-    if not args_text:
+    """设定白名单, 可一次加入多人"""
+    user_ids, invalid = parse_user_ids(args)
+    if not user_ids:
         await add_whitelist.send("请输入要加入白名单的QQ号")
         return
     
@@ -287,28 +600,29 @@ async def handle_add_whitelist(bot: Bot, event: GroupMessageEvent, args=CommandA
     target_group = binding["target_group"]
     
     try:
-        user_id = args_text
+        # 用一次获取的成员名单验证所有人是否在群中
+        roster = await member_cache.get(bot, int(target_group))
+        members = [user_id for user_id in user_ids if user_id in roster.members]
+        missing = [user_id for user_id in user_ids if user_id not in roster.members]
         
-        # 验证用户是否在群中
-        try:
-            member_info = await bot.get_group_member_info(
-                group_id=int(target_group),
-                user_id=int(user_id)
-            )
-        except Exception:
-            await add_whitelist.send(f"用户 {user_id} 不在目标群中")
-            return
+        added = await data_manager.add_whitelist_many(target_group, members)
         
-        data_manager.add_whitelist(target_group, user_id)
+        lines = []
+        if added:
+            lines.append(f"已将 {format_user_list(added, roster)} 加入白名单")
+        added_set = set(added)
+        existing = [user_id for user_id in members if user_id not in added_set]
+        if existing:
+            lines.append(f"已在白名单中: {format_user_list(existing, roster)}")
+        if missing:
+            lines.append(f"不在目标群中: {format_user_list(missing)}")
+        if invalid:
+            lines.append(f"无效的QQ号: {'、'.join(invalid)}")
+        await add_whitelist.send("\n".join(lines))
         
-        nickname = member_info.get("nickname", "")
-        card = member_info.get("card", "")
-        display_name = card if card else nickname
-        
-        await add_whitelist.send(f"已将 {display_name}({user_id}) 加入白名单")
-        
-    except ValueError:
-        await add_whitelist.send("请输入有效的QQ号")
+    except Exception as e:
+        logger.error(f"设定白名单失败: {e}")
+        await add_whitelist.send(f"设定白名单失败: {str(e)}")
 
 
 @remove_inactive.handle()
@@ -321,47 +635,43 @@ async def handle_remove_inactive(bot: Bot, event: GroupMessageEvent):
         await remove_inactive.send("当前群未绑定主群，请先绑定主群")
         return
     
-    target_group = binding["target_group"]
+    target_group = int(binding["target_group"])
     inactive_months = binding["inactive_months"]
-    whitelist = data_manager.get_whitelist(target_group)
     
     try:
-        # 获取群成员列表
-        member_list = await bot.get_group_member_list(group_id=int(target_group))
-        
-        # 计算不活跃时间阈值
-        threshold_date = datetime.now() - timedelta(days=30 * inactive_months)
+        # 目标群正在删除时等待该任务完成, 不重复踢人
+        running = active_kick_jobs.get(target_group)
+        if running is not None:
+            await remove_inactive.send(
+                f"群 {target_group} 正在执行删除任务"
+                f"(已处理 {running.cursor}/{len(running.candidates)} 人), 完成后汇报结果"
+            )
+            await remove_inactive.send(format_kick_result(await execute_kick_job(bot, running)))
+            return
         
-        removed_count = 0
-        failed_count = 0
+        # 刚查看过时直接删除查看到的名单
+        result = scanner.cached(bot, target_group, inactive_months)
+        if result is not None:
+            minutes = int(time.time() - result.scanned_at) // 60
+            notice = f"使用 {minutes} 分钟前查看的名单, "
+        else:
+            result = await scanner.scan(bot, target_group, inactive_months)
+            notice = ""
         
-        for member in member_list:
-            user_id = str(member["user_id"])
-            
-            # 跳过白名单用户和管理员
-            if user_id in whitelist or member["role"] in ["owner", "admin"]:
-                continue
-            
-            # 检查最后发言时间
-            last_sent_time = datetime.fromtimestamp(member["last_sent_time"])
-            
-            if last_sent_time < threshold_date:
-                try:
-                    await bot.set_group_kick(
-                        group_id=int(target_group),
-                        user_id=int(user_id),
-                        reject_add_request=False
-                    )
-                    removed_count += 1
-                    await asyncio.sleep(1)  # 避免操作过快
-                except Exception as e:
-                    logger.error(f"踢出用户 {user_id} 失败: {e}")
-                    failed_count += 1
+        if not result.candidates:
+            await remove_inactive.send("没有找到不活跃成员")
+            return
         
-        message = f"删除不活跃成员完成\n"
-        message += f"成功删除: {removed_count} 人\n"
-        if failed_count > 0:
-            message += f"删除失败: {failed_count} 人"
+        await remove_inactive.send(f"{notice}开始删除 {len(result.candidates)} 名不活跃成员")
+        job = KickJob(
+            self_id=bot.self_id,
+            target_group=target_group,
+            report_group=event.group_id,
+            candidates=result.user_ids,
+        )
+        # 名单已执行, 之后的删除需要重新扫描
+        scanner.invalidate(bot, target_group)
+        message = format_kick_result(await execute_kick_job(bot, job))
         
         await remove_inactive.send(message)
         
@@ -371,9 +681,9 @@ async def handle_remove_inactive(bot: Bot, event: GroupMessageEvent):
 
 @remove_whitelist.handle()
 async def handle_remove_whitelist(bot: Bot, event: GroupMessageEvent, args=CommandArg()):
-    """删除白名单"""
-    args_text = str(args).strip()
-    if not args_text:
+    """删除白名单, 可一次删除多人"""
+    user_ids, invalid = parse_user_ids(args)
+    if not user_ids:
         await remove_whitelist.send("请输入要从白名单删除的QQ号")
         return
     
@@ -386,32 +696,69 @@ async def handle_remove_whitelist(bot: Bot, event: GroupMessageEvent, args=Comma
     
     target_group = binding["target_group"]
     
-    try:
-        user_id = args_text
-        
-        # 检查用户是否在白名单中
-        whitelist = data_manager.get_whitelist(target_group)
-        if user_id not in whitelist:
-            await remove_whitelist.send(f"用户 {user_id} 不在白名单中")
-            return
-        
-        # 从白名单中移除
-        data_manager.data["whitelist"][target_group].discard(user_id)
-        data_manager.save_data()
-        
-        # 尝试获取用户信息用于显示
-        try:
-            member_info = await bot.get_group_member_info(
-                group_id=int(target_group),
-                user_id=int(user_id)
-            )
-            nickname = member_info.get("nickname", "")
-            card = member_info.get("card", "")
-            display_name = card if card else nickname
-            await remove_whitelist.send(f"已将 {display_name}({user_id}) 从白名单中移除")
-        except Exception:
-            # 即使获取用户信息失败也要移除白名单
-            await remove_whitelist.send(f"已将用户 {user_id} 从白名单中移除")
-        
-    except ValueError:
-        await remove_whitelist.send("请输入有效的QQ号")
\ No newline at end of file
+    removed = await data_manager.remove_whitelist_many(target_group, user_ids)
+    
+    # 只用已缓存的名单显示名字, 不为此调用接口
+    roster = member_cache.peek(bot.self_id, int(target_group))
+    lines = []
+    if removed:
+        lines.append(f"已将 {format_user_list(removed, roster)} 从白名单中移除")
+    removed_set = set(removed)
+    not_listed = [user_id for user_id in user_ids if user_id not in removed_set]
+    if not_listed:
+        lines.append(f"不在白名单中: {format_user_list(not_listed, roster)}")
+    if invalid:
+        lines.append(f"无效的QQ号: {'、'.join(invalid)}")
+    await remove_whitelist.send("\n".join(lines))
+
+
+@cache_status.handle()
+async def handle_cache_status():
+    """查看成员列表缓存命中情况"""
+    stats = member_cache.stats()
+    total = stats["hits"] + stats["misses"]
+    hit_rate = stats["hits"] / total * 100 if total else 0
+    await cache_status.send(
+        f"成员列表缓存: {stats['size']} 个群\n"
+        f"命中: {stats['hits']} 次, 未命中: {stats['misses']} 次\n"
+        f"合并并发请求: {stats['coalesced']} 次\n"
+        f"命中率: {hit_rate:.1f}%"
+    )
+
+
+@dispatch_status.handle()
+async def handle_dispatch_status():
+    """查看 API 调用队列情况"""
+    stats = api_dispatcher.stats()
+    lines = [
+        f"API 请求队列: {stats['pending']} 个等待中, 已完成 {stats['completed']} 个",
+        f"平均等待: {stats['avg_wait']:.1f} 秒, 最长等待: {stats['max_wait']:.1f} 秒",
+    ]
+    for group, depth in sorted(stats["queues"].items(), key=lambda item: -item[1]):
+        lines.append(f"群 {group}: {depth} 个等待中")
+    await dispatch_status.send("\n".join(lines))
+
+
+@kick_status.handle()
+async def handle_kick_status(event: GroupMessageEvent):
+    """查看绑定群聊正在执行的删除任务"""
+    binding = data_manager.get_binding(str(event.group_id))
+    if not binding:
+        await kick_status.send("当前群未绑定主群，请先绑定主群")
+        return
+    
+    target_group = int(binding["target_group"])
+    job = active_kick_jobs.get(target_group)
+    if job is None:
+        await kick_status.send(f"群 {target_group} 没有正在执行的删除任务")
+        return
+    
+    result = job.result()
+    started = time.strftime("%Y-%m-%d %H:%M:%S", time.localtime(job.created_at))
+    await kick_status.send(
+        f"群 {target_group} 正在执行删除任务\n"
+        f"发起群: {job.report_group}, 开始时间: {started}\n"
+        f"进度: {job.cursor}/{len(job.candidates)} 人\n"
+        f"成功删除: {len(result.removed)} 人, 删除失败: {len(result.failed)} 人\n"
+        f"当前速率: {kick_executor.rate:.2f} 次/秒"
+    )
@@ -0,0 +1,168 @@
+import os
+import json
+import asyncio
+from pathlib import Path
+from typing import Dict, Iterable, List, Optional, Set
+
+from nonebot.log import logger
+
+from .storage import atomic_write
+
+
+class ActivityTracker:
+    """本地记录的群成员最后发言时间
+
+    只记录绑定的目标群, 每个群一张 {QQ号: 时间戳} 的表。
+    :meth:`record` 在每条群消息上调用, 只做字典查找和赋值, 不进行磁盘读写;
+    修改由 :meth:`flush` 定期批量写入。
+    磁盘上由快照 ``activity.json`` 和操作日志 ``activity.jsonl`` 组成, 每次写入只向日志追加
+    两次写入之间的变化, 日志超过 ``compact_threshold`` 行后再合并进快照。
+    另外记录每个群自上次 :meth:`drain_changes` 以来的发言, 供发言时间索引增量更新。
+    """
+
+    def __init__(self, path: Path, compact_threshold: int = 1000):
+        self.path = path
+        self.journal_file = path.with_suffix(".jsonl")
+        self.compact_threshold = compact_threshold
+        self._tables: Dict[int, Dict[int, int]] = {}
+        self._changes: Dict[int, Dict[int, int]] = {}
+        # 上次写入以来的变化, 群号 -> {QQ号: 时间戳, 退群的成员为 None}
+        self._pending: Dict[int, Dict[int, Optional[int]]] = {}
+        # 上次写入以来不再记录的群
+        self._dropped: Set[int] = set()
+        self._journal_lines = 0
+        self._flush_lock = asyncio.Lock()
+
+    def _apply(self, tables: Dict[int, Dict[int, int]], op: list):
+        action, group_id, *args = op
+        group_id = int(group_id)
+        if action == "seen":
+            table = tables.setdefault(group_id, {})
+            for user_id, timestamp in args[0].items():
+                if timestamp is None:
+                    table.pop(int(user_id), None)
+                else:
+                    table[int(user_id)] = timestamp
+        elif action == "drop":
+            tables.pop(group_id, None)
+        else:
+            raise ValueError(f"unknown operation {action!r}")
+
+    def _read(self) -> Dict[int, Dict[int, int]]:
+        tables: Dict[int, Dict[int, int]] = {}
+        if self.path.exists():
+            with open(self.path, 'r', encoding='utf-8') as f:
+                data = json.load(f)
+            tables = {
+                int(group_id): {int(k): v for k, v in table.items()}
+                for group_id, table in data.items()
+            }
+        if not self.journal_file.exists():
+            return tables
+
+        valid_size = 0
+        with open(self.journal_file, 'rb') as f:
+            for line in f:
+                try:
+                    if not line.endswith(b"\n"):
+                        raise ValueError("incomplete line")
+                    self._apply(tables, json.loads(line))
+                except Exception as e:
+                    logger.warning(f"发言记录日志第 {self._journal_lines + 1} 行损坏, 已忽略之后的内容: {e}")
+                    break
+                self._journal_lines += 1
+                valid_size += len(line)
+        if valid_size < self.journal_file.stat().st_size:
+            with open(self.journal_file, 'r+b') as f:
+                f.truncate(valid_size)
+        return tables
+
+    async def load(self):
+        """在线程中读取已保存的记录"""
+        try:
+            tables = await asyncio.to_thread(self._read)
+        except Exception as e:
+            logger.error(f"加载发言记录失败: {e}")
+            return
+        for group_id, table in tables.items():
+            self._tables[group_id] = table
+            self._changes.setdefault(group_id, {})
+
+    def set_groups(self, group_ids: Iterable[int]):
+        """设定需要记录的群, 不再需要的群的记录会被丢弃"""
+        group_ids = set(group_ids)
+        for group_id in list(self._tables):
+            if group_id not in group_ids:
+                del self._tables[group_id]
+                self._changes.pop(group_id, None)
+                self._pending.pop(group_id, None)
+                self._dropped.add(group_id)
+        for group_id in group_ids:
+            self._tables.setdefault(group_id, {})
+            self._changes.setdefault(group_id, {})
+
+    def record(self, group_id: int, user_id: int, timestamp: int):
+        """记录一次发言"""
+        table = self._tables.get(group_id)
+        if table is not None:
+            table[user_id] = timestamp
+            self._changes[group_id][user_id] = timestamp
+            self._pending.setdefault(group_id, {})[user_id] = timestamp
+
+    def forget(self, group_id: int, user_id: int):
+        """成员退群或被踢出后删除其记录"""
+        table = self._tables.get(group_id)
+        if table is not None and table.pop(user_id, None) is not None:
+            self._changes[group_id].pop(user_id, None)
+            self._pending.setdefault(group_id, {})[user_id] = None
+
+    def get_table(self, group_id: int) -> Dict[int, int]:
+        """获取一个群的发言记录"""
+        return self._tables.get(group_id, {})
+
+    def drain_changes(self, group_id: int) -> Dict[int, int]:
+        """取出并清空一个群自上次调用以来的发言记录"""
+        changes = self._changes.get(group_id)
+        if not changes:
+            return {}
+        self._changes[group_id] = {}
+        return changes
+
+    def _write(self, ops: List[list], snapshot: Optional[Dict[str, Dict[int, int]]]):
+        """追加日志或合并快照(在线程中执行)"""
+        if snapshot is not None:
+            atomic_write(self.path, json.dumps(snapshot, separators=(",", ":")))
+            # 快照已包含全部记录, 清空日志
+            open(self.journal_file, 'wb').close()
+            return
+        lines = "".join(json.dumps(op, separators=(",", ":")) + "\n" for op in ops)
+        with open(self.journal_file, 'a', encoding='utf-8') as f:
+            f.write(lines)
+            f.flush()
+            os.fsync(f.fileno())
+
+    async def flush(self):
+        """将上次写入以来的变化写入磁盘, 序列化在线程中进行"""
+        async with self._flush_lock:
+            if not self._pending and not self._dropped:
+                return
+            # 先写不再记录的群, 之后重新绑定的记录在其后
+            ops = [["drop", group_id] for group_id in self._dropped]
+            ops += [["seen", group_id, changes] for group_id, changes in self._pending.items()]
+            pending, dropped = self._pending, self._dropped
+            self._pending, self._dropped = {}, set()
+
+            snapshot = None
+            if self._journal_lines + len(ops) > self.compact_threshold:
+                snapshot = {str(k): dict(v) for k, v in self._tables.items()}
+            try:
+                await asyncio.to_thread(self._write, ops, snapshot)
+            except Exception as e:
+                # 写入失败, 合并回待写的变化, 写入期间产生的新变化优先
+                for group_id, changes in pending.items():
+                    if group_id in self._tables:
+                        self._pending[group_id] = {**changes, **self._pending.get(group_id, {})}
+                self._dropped |= dropped
+                logger.error(f"保存发言记录失败: {e}")
+                return
+            self._journal_lines = 0 if snapshot is not None else self._journal_lines + len(ops)
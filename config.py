@@ -0,0 +1,59 @@
+from typing import List, Literal, Optional
+
+from pydantic import BaseModel
+
+
+class Config(BaseModel):
+    """插件配置"""
+
+    # 存储后端: json 为快照 + 操作日志, sqlite 为本地数据库
+    gmm_storage: Literal["json", "sqlite"] = "json"
+    # 数据修改后延迟写盘的秒数, 期间的多次修改会合并为一次写入
+    gmm_save_delay: float = 5.0
+    # 操作日志超过该行数后合并写入快照
+    gmm_journal_compact_threshold: int = 1000
+    # 保留的数据快照备份数量
+    gmm_snapshot_backups: int = 3
+    # 群成员列表缓存有效期(秒), 仅在不跟踪群通知时生效
+    gmm_member_cache_ttl: float = 300.0
+    # 最多缓存多少个群的成员列表
+    gmm_member_cache_size: int = 32
+    # 是否根据入群/退群/管理员/群名片通知增量更新缓存的成员名单
+    gmm_roster_track_notices: bool = True
+    # 跟踪群通知时, 成员名单完整重新同步的间隔(秒)
+    gmm_roster_resync_interval: float = 21600.0
+    # 本地发言记录写盘间隔(秒)
+    gmm_activity_save_interval: float = 60.0
+    # 踢人操作的初始频率(次/秒)
+    gmm_kick_rate: float = 1.0
+    # 自适应调速的频率下限和上限(次/秒), 设为 null 时等于初始频率
+    gmm_kick_min_rate: Optional[float] = 0.2
+    gmm_kick_max_rate: Optional[float] = 3.0
+    # 每次快速成功后增加的频率(次/秒)
+    gmm_kick_rate_step: float = 0.1
+    # 单次踢人请求的超时时间(秒), 超时视为被限流
+    gmm_kick_timeout: float = 10.0
+    # 视为被限流的错误码, 为空时只有超时会降速
+    gmm_kick_backoff_retcodes: List[int] = []
+    # 同时进行的踢人请求数
+    gmm_kick_concurrency: int = 2
+    # 所有群共用的 OneBot API 调用频率上限(次/秒), 各目标群的请求轮流执行
+    gmm_api_rate: float = 5.0
+    # 同时进行的 API 请求数
+    gmm_api_concurrency: int = 4
+    # 以合并转发消息发送不活跃成员列表, 不支持时退回逐条发送
+    gmm_report_forward: bool = True
+    # 合并转发消息中每个节点包含的成员数
+    gmm_forward_node_size: int = 20
+    # 查看不活跃成员的结果保留多久(秒), 期间执行删除会直接使用该结果
+    gmm_scan_result_ttl: float = 600.0
+    # 是否定期检查所有绑定的目标群并向管理群发送摘要, 需要 nonebot-plugin-apscheduler
+    gmm_scheduled_scan: bool = False
+    # 定期检查的间隔(小时)
+    gmm_scheduled_scan_interval: float = 24.0
+    # 相邻两个目标群开始检查的间隔(秒), 避免同时获取成员列表
+    gmm_scheduled_scan_stagger: float = 10.0
+    # 同时检查的目标群数量
+    gmm_scheduled_scan_concurrency: int = 2
+    # 摘要中列出的最久未发言人数
+    gmm_scheduled_scan_digest_size: int = 10
@@ -0,0 +1,97 @@
+import time
+import asyncio
+from collections import deque
+from typing import Any, Awaitable, Callable, Deque, Dict, Optional, Set, Tuple
+
+from .kick import TokenBucket
+
+ApiCall = Callable[[], Awaitable[Any]]
+
+
+class ApiDispatcher:
+    """OneBot API 调用调度器
+
+    每个目标群一个队列, 各队列轮流取出请求, 一个群的大量请求(如批量踢人)
+    不会让其他群的请求一直等待。所有请求共用一个令牌桶, 整体频率不超过 ``rate`` 次/秒,
+    同时进行的请求不超过 ``concurrency`` 个。
+    """
+
+    def __init__(self, rate: float, concurrency: int):
+        self.concurrency = max(1, concurrency)
+        self.bucket = TokenBucket(rate, capacity=self.concurrency)
+        self._queues: Dict[int, Deque[Tuple[asyncio.Future, ApiCall, float]]] = {}
+        # 有待处理请求的目标群, 按轮转顺序排列
+        self._ready: Deque[int] = deque()
+        # 在事件循环中首次提交请求时创建
+        self._wakeup: Optional[asyncio.Event] = None
+        self._semaphore: Optional[asyncio.Semaphore] = None
+        self._worker: Optional[asyncio.Task] = None
+        # 执行中的请求, 保留引用避免被回收
+        self._running: Set[asyncio.Task] = set()
+        self.completed = 0
+        self.total_wait = 0.0
+        self.max_wait = 0.0
+
+    async def submit(self, target_group: int, call: ApiCall) -> Any:
+        """把请求排入目标群的队列, 等待执行并返回结果"""
+        if self._worker is None or self._worker.done():
+            self._wakeup = asyncio.Event()
+            self._semaphore = asyncio.Semaphore(self.concurrency)
+            self._worker = asyncio.create_task(self._run())
+        future = asyncio.get_running_loop().create_future()
+        queue = self._queues.get(target_group)
+        if queue is None:
+            queue = self._queues[target_group] = deque()
+            self._ready.append(target_group)
+        queue.append((future, call, time.monotonic()))
+        self._wakeup.set()
+        return await future
+
+    async def _run(self):
+        while True:
+            if not self._ready:
+                self._wakeup.clear()
+                await self._wakeup.wait()
+                continue
+            target_group = self._ready.popleft()
+            queue = self._queues[target_group]
+            future, call, enqueued_at = queue.popleft()
+            if queue:
+                # 该群还有请求, 排到队尾等待下一轮
+                self._ready.append(target_group)
+            else:
+                del self._queues[target_group]
+            if future.cancelled():
+                continue
+
+            await self.bucket.acquire()
+            await self._semaphore.acquire()
+            wait = time.monotonic() - enqueued_at
+            self.total_wait += wait
+            self.max_wait = max(self.max_wait, wait)
+            task = asyncio.create_task(self._execute(future, call))
+            self._running.add(task)
+            task.add_done_callback(self._running.discard)
+
+    async def _execute(self, future: asyncio.Future, call: ApiCall):
+        try:
+            result = await call()
+        except Exception as e:
+            if not future.cancelled():
+                future.set_exception(e)
+        else:
+            if not future.cancelled():
+                future.set_result(result)
+        finally:
+            self.completed += 1
+            self._semaphore.release()
+
+    def stats(self) -> Dict[str, Any]:
+        """队列深度和等待时间统计"""
+        return {
+            "queues": {group: len(queue) for group, queue in self._queues.items()},
+            "pending": sum(len(queue) for queue in self._queues.values()),
+            "completed": self.completed,
+            "avg_wait": self.total_wait / self.completed if self.completed else 0.0,
+            "max_wait": self.max_wait,
+        }
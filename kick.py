@@ -0,0 +1,304 @@
+import json
+import time
+import asyncio
+from dataclasses import asdict, dataclass, field
+from pathlib import Path
+from typing import TYPE_CHECKING, Callable, Collection, Dict, Iterable, List, Optional
+
+from nonebot.log import logger
+from nonebot.adapters.onebot.v11 import ActionFailed, Bot
+
+if TYPE_CHECKING:
+    from .dispatch import ApiDispatcher
+
+from .storage import atomic_write
+
+
+class TokenBucket:
+    """令牌桶限速器, 每秒补充 ``rate`` 个令牌, 最多积累 ``capacity`` 个"""
+
+    def __init__(self, rate: float, capacity: float = 1.0):
+        self.rate = rate
+        self.capacity = capacity
+        self._tokens = capacity
+        self._updated_at = time.monotonic()
+
+    async def acquire(self):
+        """取得一个令牌, 令牌不足时等待"""
+        while True:
+            now = time.monotonic()
+            self._tokens = min(self.capacity, self._tokens + (now - self._updated_at) * self.rate)
+            self._updated_at = now
+            if self._tokens >= 1:
+                self._tokens -= 1
+                return
+            await asyncio.sleep((1 - self._tokens) / self.rate)
+
+    def drain(self):
+        """清空已积累的令牌, 降速后立即生效"""
+        self._tokens = 0
+        self._updated_at = time.monotonic()
+
+
+class AimdController:
+    """加性增、乘性减的速率控制
+
+    请求快速成功时令牌桶速率增加 ``step``, 超时或返回限流错误时速率乘以 ``backoff``,
+    速率保持在 ``[min_rate, max_rate]`` 之间。
+    """
+
+    def __init__(
+        self,
+        bucket: TokenBucket,
+        min_rate: float,
+        max_rate: float,
+        step: float,
+        backoff: float = 0.5,
+        slow_latency: float = 2.0,
+    ):
+        self.bucket = bucket
+        self.min_rate = min_rate
+        self.max_rate = max_rate
+        self.step = step
+        self.backoff = backoff
+        self.slow_latency = slow_latency
+
+    def on_success(self, latency: float):
+        # 响应变慢说明接近上限, 保持当前速率
+        if latency < self.slow_latency:
+            self.bucket.rate = min(self.max_rate, self.bucket.rate + self.step)
+
+    def on_throttled(self):
+        self.bucket.rate = max(self.min_rate, self.bucket.rate * self.backoff)
+        self.bucket.drain()
+        logger.warning(f"踢人请求被限制, 速率降至 {self.bucket.rate:.2f} 次/秒")
+
+
+@dataclass
+class KickResult:
+    """一次批量踢人的结果"""
+
+    removed: List[int] = field(default_factory=list)
+    failed: List[int] = field(default_factory=list)
+
+
+class KickExecutor:
+    """批量踢人执行器
+
+    所有任务共用一个令牌桶, 保证账号整体的操作频率不超过当前速率;
+    速率从 ``rate`` 开始由 :class:`AimdController` 根据请求结果在
+    ``[min_rate, max_rate]`` 之间调整。每次执行最多同时有 ``concurrency`` 个请求在进行。
+    请求超时或返回 ``backoff_retcodes`` 中的错误码时降速, 成员已退群、无权限等其他失败不影响速率。
+    指定 ``dispatcher`` 时请求经由它排队, 与其他群的 API 调用轮流执行。
+    """
+
+    def __init__(
+        self,
+        rate: float,
+        concurrency: int,
+        min_rate: Optional[float] = None,
+        max_rate: Optional[float] = None,
+        step: float = 0.1,
+        timeout: float = 10.0,
+        backoff_retcodes: Collection[int] = (),
+        dispatcher: Optional["ApiDispatcher"] = None,
+    ):
+        self.dispatcher = dispatcher
+        self.concurrency = max(1, concurrency)
+        self.timeout = timeout
+        self.backoff_retcodes = set(backoff_retcodes)
+        self.bucket = TokenBucket(rate, capacity=self.concurrency)
+        self.controller = AimdController(
+            self.bucket,
+            min_rate if min_rate is not None else rate,
+            max_rate if max_rate is not None else rate,
+            step,
+        )
+
+    @property
+    def rate(self) -> float:
+        return self.bucket.rate
+
+    def _is_throttled(self, error: Exception) -> bool:
+        if isinstance(error, asyncio.TimeoutError):
+            return True
+        if isinstance(error, ActionFailed):
+            return getattr(error, "info", {}).get("retcode") in self.backoff_retcodes
+        return False
+
+    async def _kick(self, bot: Bot, group_id: int, user_id: int) -> float:
+        """发送一次踢人请求, 返回请求耗时(不含排队时间)"""
+
+        async def call() -> float:
+            started_at = time.monotonic()
+            await asyncio.wait_for(
+                bot.set_group_kick(
+                    group_id=group_id,
+                    user_id=user_id,
+                    reject_add_request=False
+                ),
+                self.timeout,
+            )
+            return time.monotonic() - started_at
+
+        if self.dispatcher is None:
+            return await call()
+        return await self.dispatcher.submit(group_id, call)
+
+    async def run(
+        self,
+        bot: Bot,
+        group_id: int,
+        user_ids: Iterable[int],
+        on_result: Optional[Callable[[int, bool], None]] = None,
+    ) -> KickResult:
+        """踢出 ``user_ids`` 中的成员, 每处理完一人以 (QQ号, 是否成功) 调用一次 ``on_result``"""
+        result = KickResult()
+        pending = iter(user_ids)
+
+        async def worker():
+            # 各个 worker 从同一个迭代器中取人, 直到全部处理完
+            for user_id in pending:
+                await self.bucket.acquire()
+                try:
+                    latency = await self._kick(bot, group_id, user_id)
+                except Exception as e:
+                    logger.error(f"踢出用户 {user_id} 失败: {e!r}")
+                    result.failed.append(user_id)
+                    if self._is_throttled(e):
+                        self.controller.on_throttled()
+                    if on_result is not None:
+                        on_result(user_id, False)
+                    continue
+                self.controller.on_success(latency)
+                result.removed.append(user_id)
+                if on_result is not None:
+                    on_result(user_id, True)
+
+        await asyncio.gather(*(worker() for _ in range(self.concurrency)))
+        return result
+
+
+@dataclass
+class KickJob:
+    """一次删除不活跃成员的任务, 保存到磁盘以便重启后继续"""
+
+    self_id: str
+    target_group: int
+    report_group: int
+    candidates: List[int]
+    # 已处理的人数
+    cursor: int = 0
+    # 每人的处理结果, QQ号 -> 是否成功
+    outcomes: Dict[int, bool] = field(default_factory=dict)
+    created_at: float = field(default_factory=time.time)
+
+    @classmethod
+    def from_dict(cls, data: Dict) -> "KickJob":
+        data = dict(data)
+        data["outcomes"] = {int(k): v for k, v in data.get("outcomes", {}).items()}
+        return cls(**data)
+
+    def pending(self) -> List[int]:
+        """尚未处理的成员, 重启前正在处理的成员会被重新处理"""
+        return [user_id for user_id in self.candidates if user_id not in self.outcomes]
+
+    def record(self, user_id: int, ok: bool):
+        self.outcomes[user_id] = ok
+        self.cursor = len(self.outcomes)
+
+    def result(self) -> KickResult:
+        result = KickResult()
+        for user_id, ok in self.outcomes.items():
+            (result.removed if ok else result.failed).append(user_id)
+        return result
+
+
+class KickJobStore:
+    """把未完成的 :class:`KickJob` 保存在目录中, 每个任务一个文件"""
+
+    def __init__(self, directory: Path):
+        self.directory = directory
+
+    def _path(self, job: KickJob) -> Path:
+        return self.directory / f"{job.self_id}_{job.target_group}.json"
+
+    async def load_all(self) -> List[KickJob]:
+        """在线程中读取所有未完成的任务"""
+        return await asyncio.to_thread(self._read_all)
+
+    def _read_all(self) -> List[KickJob]:
+        jobs = []
+        if not self.directory.exists():
+            return jobs
+        for path in self.directory.glob("*.json"):
+            try:
+                with open(path, 'r', encoding='utf-8') as f:
+                    jobs.append(KickJob.from_dict(json.load(f)))
+            except Exception as e:
+                logger.error(f"加载删除任务 {path.name} 失败: {e}")
+        return jobs
+
+    def _write(self, path: Path, data: Dict):
+        self.directory.mkdir(parents=True, exist_ok=True)
+        atomic_write(path, json.dumps(data, separators=(",", ":")))
+
+    async def save(self, job: KickJob):
+        data = asdict(job)
+        data["outcomes"] = {str(k): v for k, v in job.outcomes.items()}
+        try:
+            await asyncio.to_thread(self._write, self._path(job), data)
+        except Exception as e:
+            logger.error(f"保存删除任务失败: {e}")
+
+    async def remove(self, job: KickJob):
+        await asyncio.to_thread(self._path(job).unlink, True)
+
+
+async def run_kick_job(
+    executor: KickExecutor,
+    store: KickJobStore,
+    bot: Bot,
+    job: KickJob,
+    on_kicked: Optional[Callable[[int], None]] = None,
+    save_interval: float = 5.0,
+) -> KickResult:
+    """执行(或继续执行)任务, 期间每隔 ``save_interval`` 秒保存进度, 完成后删除任务文件
+
+    被取消或出错时保存最终进度, 重启后只重新处理尚未处理的成员。
+    """
+    saved_cursor = -1
+    stop = asyncio.Event()
+
+    def on_result(user_id: int, ok: bool):
+        job.record(user_id, ok)
+        if ok and on_kicked is not None:
+            on_kicked(user_id)
+
+    async def save_progress():
+        # 不直接取消本任务: 取消不会中止线程中正在进行的写入
+        nonlocal saved_cursor
+        while True:
+            try:
+                await asyncio.wait_for(stop.wait(), save_interval)
+                return
+            except asyncio.TimeoutError:
+                pass
+            if job.cursor != saved_cursor:
+                saved_cursor = job.cursor
+                await store.save(job)
+
+    await store.save(job)
+    saver = asyncio.create_task(save_progress())
+    finished = False
+    try:
+        await executor.run(bot, job.target_group, job.pending(), on_result=on_result)
+        finished = True
+    finally:
+        stop.set()
+        # 等待正在进行的写入完成, 避免它在任务文件删除之后才落盘
+        await asyncio.shield(saver)
+        if not finished:
+            await asyncio.shield(store.save(job))
+    await store.remove(job)
+    return job.result()
@@ -0,0 +1,234 @@
+import time
+import asyncio
+from bisect import bisect_left, bisect_right
+from collections import OrderedDict
+from typing import Dict, Iterator, List, Optional, Tuple
+
+from nonebot import get_bots
+from nonebot.adapters.onebot.v11 import Bot
+
+from .dispatch import ApiDispatcher
+
+
+class ActivityIndex:
+    """按最后发言时间升序排列的成员索引
+
+    "最后发言早于某时间的成员" 只需一次二分查找和切片。
+    发言时间只会变晚, 索引中的时间可能比实际早, 查询结果只会多不会少。
+    """
+
+    __slots__ = ("_times", "_ids", "_time_of")
+
+    def __init__(self, members: Dict[int, Dict], last_seen: Dict[int, int]):
+        pairs = sorted(
+            (max(member["last_sent_time"], last_seen.get(user_id, 0)), user_id)
+            for user_id, member in members.items()
+        )
+        self._times = [t for t, _ in pairs]
+        self._ids = [user_id for _, user_id in pairs]
+        self._time_of = {user_id: t for t, user_id in pairs}
+
+    def __len__(self) -> int:
+        return len(self._ids)
+
+    def _locate(self, user_id: int) -> int:
+        i = bisect_left(self._times, self._time_of[user_id])
+        while self._ids[i] != user_id:
+            i += 1
+        return i
+
+    def discard(self, user_id: int):
+        if user_id in self._time_of:
+            i = self._locate(user_id)
+            del self._times[i]
+            del self._ids[i]
+            del self._time_of[user_id]
+
+    def update(self, user_id: int, timestamp: int):
+        """更新成员的最后发言时间, 不在索引中的成员会被加入"""
+        old = self._time_of.get(user_id)
+        if old is not None:
+            if timestamp <= old:
+                return
+            self.discard(user_id)
+        i = bisect_right(self._times, timestamp)
+        self._times.insert(i, timestamp)
+        self._ids.insert(i, user_id)
+        self._time_of[user_id] = timestamp
+
+    def before(self, threshold: int) -> List[int]:
+        """最后发言早于 ``threshold`` 的成员, 按时间升序"""
+        return self._ids[:bisect_left(self._times, threshold)]
+
+    def items(self) -> Iterator[Tuple[int, int]]:
+        """按时间升序遍历 (最后发言时间, QQ号)"""
+        return zip(self._times, self._ids)
+
+
+class Roster:
+    """一个群的成员名单, 由成员列表初始化, 之后根据群通知增量更新"""
+
+    __slots__ = ("members", "synced_at", "index")
+
+    def __init__(self, member_list: List[Dict]):
+        self.members: Dict[int, Dict] = {member["user_id"]: member for member in member_list}
+        self.synced_at = time.monotonic()
+        self.index: Optional[ActivityIndex] = None
+
+    def __len__(self) -> int:
+        return len(self.members)
+
+    def add(self, user_id: int, join_time: int):
+        """新成员入群, 入群时间视为最后发言时间"""
+        self.members[user_id] = {
+            "user_id": user_id,
+            "nickname": "",
+            "card": "",
+            "role": "member",
+            "join_time": join_time,
+            "last_sent_time": join_time,
+        }
+        if self.index is not None:
+            self.index.update(user_id, join_time)
+
+    def remove(self, user_id: int):
+        self.members.pop(user_id, None)
+        if self.index is not None:
+            self.index.discard(user_id)
+
+    def update(self, user_id: int, **fields):
+        member = self.members.get(user_id)
+        if member is not None:
+            member.update(fields)
+
+    def activity_index(self, last_seen: Dict[int, int], changes: Dict[int, int]) -> ActivityIndex:
+        """获取最后发言时间索引
+
+        首次调用时由名单和本地记录 ``last_seen`` 建立, 之后只应用上次调用以来的发言 ``changes``。
+        """
+        if self.index is None:
+            self.index = ActivityIndex(self.members, last_seen)
+            return self.index
+        for user_id, timestamp in changes.items():
+            if user_id in self.members:
+                self.index.update(user_id, timestamp)
+        return self.index
+
+
+class MemberListCache:
+    """群成员名单缓存
+
+    按 (机器人, 目标群) 保存由 ``get_group_member_list`` 初始化的 :class:`Roster`,
+    缓存的群数量超过 ``max_size`` 时淘汰最久未使用的群。
+    ``track_notices`` 开启时名单由群通知保持最新, 读取时不再按 ``ttl`` 过期,
+    而是由 :meth:`resync_stale` 在后台定期完整同步以修正偏差。
+    同一个群同时只会有一个获取请求, 并发的调用者共同等待它的结果。
+    指定 ``dispatcher`` 时获取请求经由它排队。
+    """
+
+    def __init__(
+        self,
+        ttl: float,
+        max_size: int,
+        track_notices: bool = True,
+        dispatcher: Optional[ApiDispatcher] = None,
+    ):
+        self.dispatcher = dispatcher
+        self.ttl = ttl
+        self.max_size = max_size
+        self.track_notices = track_notices
+        self.hits = 0
+        self.misses = 0
+        self.coalesced = 0
+        self._entries: "OrderedDict[Tuple[str, int], Roster]" = OrderedDict()
+        self._inflight: Dict[Tuple[str, int], asyncio.Task] = {}
+
+    async def get(self, bot: Bot, group_id: int, force: bool = False) -> Roster:
+        """获取群成员名单, 缓存有效时直接返回"""
+        key = (bot.self_id, group_id)
+        roster = self._entries.get(key)
+        if roster is not None and not force and (
+            self.track_notices or time.monotonic() - roster.synced_at < self.ttl
+        ):
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return roster
+
+        task = self._inflight.get(key)
+        if task is not None:
+            self.coalesced += 1
+        else:
+            self.misses += 1
+            task = asyncio.create_task(self._fetch(bot, key))
+            self._inflight[key] = task
+        # 某个调用者被取消时不影响其他等待者
+        return await asyncio.shield(task)
+
+    async def _fetch(self, bot: Bot, key: Tuple[str, int]) -> Roster:
+        try:
+            if self.dispatcher is None:
+                member_list = await bot.get_group_member_list(group_id=key[1])
+            else:
+                member_list = await self.dispatcher.submit(
+                    key[1], lambda: bot.get_group_member_list(group_id=key[1])
+                )
+            roster = Roster(member_list)
+        finally:
+            current = self._inflight.get(key)
+            if current is asyncio.current_task():
+                del self._inflight[key]
+            else:
+                current = None
+        # 获取期间缓存被清除的, 结果只返回给已在等待的调用者
+        if current is not None:
+            self._entries[key] = roster
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_size:
+                self._entries.popitem(last=False)
+        return roster
+
+    def cached(self, self_id: str, group_id: int) -> Optional[Roster]:
+        """返回已缓存的名单, 不论是否跟踪群通知, 不触发获取"""
+        return self._entries.get((self_id, group_id))
+
+    def peek(self, self_id: str, group_id: int) -> Optional[Roster]:
+        """返回由群通知保持最新的名单, 不跟踪群通知时返回 None, 不触发获取"""
+        if not self.track_notices:
+            return None
+        return self.cached(self_id, group_id)
+
+    async def resync_stale(self, interval: float):
+        """重新获取同步时间超过 ``interval`` 秒的名单"""
+        now = time.monotonic()
+        bots = get_bots()
+        for key, roster in list(self._entries.items()):
+            if now - roster.synced_at < interval:
+                continue
+            bot = bots.get(key[0])
+            if not isinstance(bot, Bot):
+                self._entries.pop(key, None)
+                continue
+            try:
+                await self.get(bot, key[1], force=True)
+            except Exception:
+                # 获取失败(如机器人已退群)时丢弃名单, 下次使用时重新获取
+                self._entries.pop(key, None)
+
+    def invalidate(self, group_id: Optional[int] = None):
+        """使指定群(不指定则为全部)的缓存失效"""
+        if group_id is None:
+            self._entries.clear()
+            self._inflight.clear()
+            return
+        for key in [key for key in self._entries if key[1] == group_id]:
+            del self._entries[key]
+        for key in [key for key in self._inflight if key[1] == group_id]:
+            del self._inflight[key]
+
+    def stats(self) -> Dict[str, int]:
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "coalesced": self.coalesced,
+            "size": len(self._entries),
+        }
@@ -0,0 +1,241 @@
+import time
+import heapq
+from bisect import bisect_left
+from dataclasses import dataclass, replace
+from operator import itemgetter
+from typing import Dict, Iterable, List, Optional, Tuple
+
+from nonebot.adapters.onebot.v11 import Bot
+
+from .activity import ActivityTracker
+from .members import MemberListCache
+from .storage import BaseDataManager, Whitelist
+
+try:
+    import numpy as np
+except ImportError:  # pragma: no cover - numpy 是可选依赖
+    np = None
+
+# 群身份编码, 只有普通成员参与不活跃判定
+ROLE_CODES = {"member": 0, "admin": 1, "owner": 2}
+
+SECONDS_PER_DAY = 86400
+
+
+def inactive_threshold(now: int, inactive_months: int) -> int:
+    """不活跃判定的时间戳阈值, 每月按30天计算"""
+    return now - inactive_months * 30 * SECONDS_PER_DAY
+
+
+def days_since(now: int, timestamp: int) -> int:
+    """从 ``timestamp`` 到 ``now`` 经过的整天数"""
+    return (now - timestamp) // SECONDS_PER_DAY
+
+
+def display_name(member: Dict) -> str:
+    """成员的显示名称, 优先使用群名片"""
+    return member.get("card") or member.get("nickname", "")
+
+
+def scan_inactive(
+    members: Iterable[Dict],
+    whitelist: Whitelist,
+    last_seen: Dict[int, int],
+    threshold: int,
+    limit: Optional[int] = None,
+) -> Tuple[List[Tuple[int, Dict]], int]:
+    """找出最后发言时间早于 ``threshold`` (时间戳) 的普通成员
+
+    最后发言时间取成员信息中的 ``last_sent_time`` 与本地记录 ``last_seen`` 中较晚的一个,
+    白名单成员和管理员会被跳过。返回按最后发言时间升序排列的 (最后发言时间, 成员) 列表
+    和不活跃成员总数; 指定 ``limit`` 时列表只包含最久未发言的 ``limit`` 人。
+    安装了 numpy 时按列批量计算, 否则逐个判断。
+    """
+    members = list(members)
+    if np is not None and members:
+        return _scan_numpy(members, whitelist, last_seen, threshold, limit)
+    return _scan_python(members, whitelist, last_seen, threshold, limit)
+
+
+def _scan_python(
+    members: List[Dict],
+    whitelist: Whitelist,
+    last_seen: Dict[int, int],
+    threshold: int,
+    limit: Optional[int],
+) -> Tuple[List[Tuple[int, Dict]], int]:
+    result = []
+    for member in members:
+        user_id = member["user_id"]
+        if member["role"] in ("owner", "admin") or user_id in whitelist:
+            continue
+        last_sent_time = max(member["last_sent_time"], last_seen.get(user_id, 0))
+        if last_sent_time < threshold:
+            result.append((last_sent_time, member))
+    total = len(result)
+    if limit is not None and limit < total:
+        # 只需要前 limit 人时用堆选择, 不对全部结果排序
+        return heapq.nsmallest(limit, result, key=itemgetter(0)), total
+    result.sort(key=itemgetter(0))
+    return result, total
+
+
+def _scan_numpy(
+    members: List[Dict],
+    whitelist: Whitelist,
+    last_seen: Dict[int, int],
+    threshold: int,
+    limit: Optional[int],
+) -> Tuple[List[Tuple[int, Dict]], int]:
+    count = len(members)
+    user_ids = np.fromiter((m["user_id"] for m in members), dtype=np.int64, count=count)
+    last_sent = np.fromiter((m["last_sent_time"] for m in members), dtype=np.int64, count=count)
+    roles = np.fromiter(
+        (ROLE_CODES.get(m["role"], 0) for m in members), dtype=np.uint8, count=count
+    )
+
+    if last_seen:
+        # 本地记录按QQ号排序后二分查找, 与成员列表对齐
+        local_ids = np.fromiter(last_seen.keys(), dtype=np.int64, count=len(last_seen))
+        local_times = np.fromiter(last_seen.values(), dtype=np.int64, count=len(last_seen))
+        order = np.argsort(local_ids)
+        local_ids, local_times = local_ids[order], local_times[order]
+        pos = np.minimum(np.searchsorted(local_ids, user_ids), len(local_ids) - 1)
+        found = local_ids[pos] == user_ids
+        last_sent = np.where(found, np.maximum(last_sent, local_times[pos]), last_sent)
+
+    mask = (roles == ROLE_CODES["member"]) & (last_sent < threshold)
+    if len(whitelist):
+        whitelist_ids = np.frombuffer(whitelist.as_array(), dtype=np.uint64).astype(np.int64)
+        mask &= ~np.isin(user_ids, whitelist_ids, assume_unique=True)
+
+    indices = np.flatnonzero(mask)
+    total = len(indices)
+    if limit is not None and limit < total:
+        indices = indices[np.argpartition(last_sent[indices], limit - 1)[:limit]]
+    indices = indices[np.argsort(last_sent[indices], kind="stable")]
+    return [(int(last_sent[i]), members[i]) for i in indices], total
+
+
+@dataclass
+class ScanResult:
+    """一次不活跃成员扫描的结果"""
+
+    target_group: int
+    inactive_months: int
+    # 扫描时的当前时间戳, 报告中的天数都以它为准
+    scanned_at: int
+    # 按最后发言时间升序的 (最后发言时间, 成员)
+    candidates: List[Tuple[int, Dict]]
+    # 不活跃成员总数, 只扫描前 limit 人时可能多于 candidates
+    inactive_count: int
+    member_count: int
+    whitelist_count: int
+    limit: Optional[int] = None
+
+    @property
+    def user_ids(self) -> List[int]:
+        return [member["user_id"] for _, member in self.candidates]
+
+
+class InactiveScanner:
+    """不活跃成员扫描
+
+    查看和删除共用同一次扫描的结果: 结果按 (机器人, 目标群) 缓存 ``result_ttl`` 秒,
+    删除时直接使用查看过的名单, 不再重新获取和筛选。
+    扫描通过名单上的 :class:`ActivityIndex` 二分查找, 只检查最后发言早于阈值的成员。
+    """
+
+    def __init__(
+        self,
+        data_manager: BaseDataManager,
+        member_cache: MemberListCache,
+        activity_tracker: ActivityTracker,
+        result_ttl: float,
+    ):
+        self.data_manager = data_manager
+        self.member_cache = member_cache
+        self.activity_tracker = activity_tracker
+        self.result_ttl = result_ttl
+        self._results: Dict[Tuple[str, int], ScanResult] = {}
+
+    async def scan(
+        self, bot: Bot, target_group: int, inactive_months: int, limit: Optional[int] = None
+    ) -> ScanResult:
+        """获取成员名单并扫描
+
+        指定 ``limit`` 时只取最久未发言的 ``limit`` 人, 这样的部分结果不会被缓存。
+        """
+        whitelist = self.data_manager.get_whitelist(target_group)
+        roster = await self.member_cache.get(bot, target_group)
+        last_seen = self.activity_tracker.get_table(target_group)
+        now = int(time.time())
+        threshold = inactive_threshold(now, inactive_months)
+        # 先用发言时间索引取出可能不活跃的成员, 再筛选白名单和管理员
+        index = roster.activity_index(last_seen, self.activity_tracker.drain_changes(target_group))
+        members = roster.members
+        narrowed = [members[user_id] for user_id in index.before(threshold) if user_id in members]
+        candidates, inactive_count = scan_inactive(
+            narrowed, whitelist, last_seen, threshold, limit
+        )
+        result = ScanResult(
+            target_group=target_group,
+            inactive_months=inactive_months,
+            scanned_at=now,
+            candidates=candidates,
+            inactive_count=inactive_count,
+            member_count=len(roster),
+            whitelist_count=len(whitelist),
+            limit=limit,
+        )
+        if limit is None:
+            self._results[(bot.self_id, target_group)] = result
+        return result
+
+    async def histogram(
+        self, bot: Bot, target_group: int, months: Iterable[int]
+    ) -> List[Tuple[int, int]]:
+        """统计判定月数分别为 ``months`` 中各值时的不活跃人数, 返回 (月数, 人数) 列表
+
+        只获取一次名单, 遍历一次索引得到参与判定成员的有序时间, 每个月数只需一次二分查找。
+        """
+        whitelist = self.data_manager.get_whitelist(target_group)
+        roster = await self.member_cache.get(bot, target_group)
+        last_seen = self.activity_tracker.get_table(target_group)
+        index = roster.activity_index(last_seen, self.activity_tracker.drain_changes(target_group))
+        members = roster.members
+        times = [
+            max(t, last_seen.get(user_id, 0))
+            for t, user_id in index.items()
+            if user_id in members
+            and user_id not in whitelist
+            and members[user_id]["role"] not in ("owner", "admin")
+        ]
+        # 合并本地记录后个别时间可能变晚, 重新排序保证二分查找正确
+        times.sort()
+        now = int(time.time())
+        return [(m, bisect_left(times, inactive_threshold(now, m))) for m in months]
+
+    def cached(self, bot: Bot, target_group: int, inactive_months: int) -> Optional[ScanResult]:
+        """返回仍然有效的上次扫描结果
+
+        判定月数变化或结果过期时返回 ``None``; 扫描后新加入白名单的成员会被剔除。
+        """
+        result = self._results.get((bot.self_id, target_group))
+        if (
+            result is None
+            or result.inactive_months != inactive_months
+            or time.time() - result.scanned_at >= self.result_ttl
+        ):
+            return None
+        whitelist = self.data_manager.get_whitelist(target_group)
+        candidates = [c for c in result.candidates if c[1]["user_id"] not in whitelist]
+        return replace(
+            result,
+            candidates=candidates,
+            inactive_count=len(candidates),
+            whitelist_count=len(whitelist),
+        )
+
+    def invalidate(self, bot: Bot, target_group: int):
+        self._results.pop((bot.self_id, target_group), None)
@@ -0,0 +1,749 @@
+import os
+import json
+import asyncio
+import sqlite3
+from abc import ABC, abstractmethod
+from concurrent.futures import ThreadPoolExecutor
+from array import array
+from bisect import bisect_left
+from pathlib import Path
+from typing import Dict, Iterable, Iterator, List, Optional, Set, Tuple, Union
+
+from nonebot.log import logger
+
+
+class Whitelist:
+    """白名单集合
+
+    QQ号以升序存放在 ``array('Q')`` 中, 每人只占 8 字节, 成员判断为二分查找。
+    """
+
+    __slots__ = ("_ids",)
+
+    def __init__(self, user_ids: Iterable[int] = ()):
+        self._ids = array("Q", sorted(set(user_ids)))
+
+    def __contains__(self, user_id: int) -> bool:
+        i = bisect_left(self._ids, user_id)
+        return i < len(self._ids) and self._ids[i] == user_id
+
+    def __iter__(self) -> Iterator[int]:
+        return iter(self._ids)
+
+    def __len__(self) -> int:
+        return len(self._ids)
+
+    def tolist(self) -> List[int]:
+        return self._ids.tolist()
+
+    def as_array(self) -> array:
+        """返回底层的有序数组, 调用者不应修改"""
+        return self._ids
+
+    def add(self, user_id: int):
+        i = bisect_left(self._ids, user_id)
+        if i == len(self._ids) or self._ids[i] != user_id:
+            self._ids.insert(i, user_id)
+
+    def discard(self, user_id: int):
+        i = bisect_left(self._ids, user_id)
+        if i < len(self._ids) and self._ids[i] == user_id:
+            del self._ids[i]
+
+    def update(self, user_ids: Iterable[int]):
+        """批量加入, 只重建一次数组"""
+        self._ids = array("Q", sorted(set(self._ids).union(user_ids)))
+
+    def difference_update(self, user_ids: Iterable[int]):
+        """批量移除, 只重建一次数组"""
+        removed = set(user_ids)
+        self._ids = array("Q", (user_id for user_id in self._ids if user_id not in removed))
+
+
+GroupId = Union[int, str]
+
+
+def _fsync_dir(directory: Path):
+    """同步目录项, 保证重命名在断电后仍然有效(Windows 不支持, 忽略)"""
+    try:
+        fd = os.open(directory, os.O_RDONLY)
+    except OSError:
+        return
+    try:
+        os.fsync(fd)
+    except OSError:
+        pass
+    finally:
+        os.close(fd)
+
+
+def atomic_write(path: Path, text: str, backups: int = 0):
+    """原子地写入文件
+
+    先写入临时文件并 fsync, 再重命名覆盖目标文件, 写入中途崩溃不会留下不完整的文件。
+    ``backups`` 大于 0 时, 原文件依次轮换为 ``path.1`` ~ ``path.N``, ``path.1`` 最新。
+    """
+    tmp = path.with_name(path.name + ".tmp")
+    with open(tmp, 'w', encoding='utf-8') as f:
+        f.write(text)
+        f.flush()
+        os.fsync(f.fileno())
+    if backups > 0 and path.exists():
+        for i in range(backups - 1, 0, -1):
+            older = path.with_name(f"{path.name}.{i}")
+            if older.exists():
+                os.replace(older, path.with_name(f"{path.name}.{i + 1}"))
+        os.replace(path, path.with_name(f"{path.name}.1"))
+    os.replace(tmp, path)
+    _fsync_dir(path.parent)
+
+
+def backup_paths(path: Path, backups: int) -> List[Path]:
+    """``path`` 及其轮换备份, 从新到旧"""
+    return [path] + [path.with_name(f"{path.name}.{i}") for i in range(1, backups + 1)]
+
+
+class BaseDataManager(ABC):
+    """数据存储接口, 所有存储后端都提供相同的方法
+
+    修改方法为协程, 需要写盘的后端在存储线程中提交; 查询方法直接返回。
+    """
+
+    @abstractmethod
+    async def bind_group(self, current_group: str, target_group: str) -> bool:
+        """绑定群聊"""
+
+    @abstractmethod
+    async def unbind_group(self, current_group: str) -> bool:
+        """取消绑定, 同时删除目标群的白名单"""
+
+    @abstractmethod
+    async def set_inactive_months(self, current_group: str, months: int) -> bool:
+        """设定不活跃月数"""
+
+    @abstractmethod
+    def get_binding(self, current_group: str) -> Optional[Dict]:
+        """获取绑定信息"""
+
+    @abstractmethod
+    def iter_bindings(self) -> Iterator[Tuple[str, Dict]]:
+        """遍历所有绑定, 产生 (当前群号, 绑定信息)"""
+
+    @abstractmethod
+    async def add_whitelist(self, group_id: GroupId, user_id: int):
+        """添加白名单"""
+
+    @abstractmethod
+    async def remove_whitelist(self, group_id: GroupId, user_id: int) -> bool:
+        """删除白名单"""
+
+    @abstractmethod
+    async def add_whitelist_many(self, group_id: GroupId, user_ids: Iterable[int]) -> List[int]:
+        """批量添加白名单, 只写入一次, 返回新加入的QQ号"""
+
+    @abstractmethod
+    async def remove_whitelist_many(self, group_id: GroupId, user_ids: Iterable[int]) -> List[int]:
+        """批量删除白名单, 只写入一次, 返回实际移除的QQ号"""
+
+    @abstractmethod
+    def get_whitelist(self, group_id: GroupId) -> Whitelist:
+        """获取白名单"""
+
+    async def load(self):
+        """读取数据, 在使用其他方法之前调用"""
+
+    async def save(self):
+        """立即写入尚未保存的修改"""
+
+    def close(self):
+        """释放存储占用的资源"""
+
+
+class DataManager(BaseDataManager):
+    """JSON 快照 + 操作日志存储
+
+    数据由快照文件 ``data.json`` 和追加写入的操作日志 ``journal.jsonl`` 组成,
+    每次修改只向日志追加一行, 日志超过阈值后再合并进快照。
+    所有磁盘读写都在一个专用线程中依次执行, 不会阻塞事件循环, 也不会交错写入。
+    """
+    
+    def __init__(
+        self,
+        data_dir: Path,
+        save_delay: float = 5.0,
+        compact_threshold: int = 1000,
+        backups: int = 3,
+    ):
+        self.data_file = data_dir / "data.json"
+        self.journal_file = data_dir / "journal.jsonl"
+        self.save_delay = save_delay
+        self.compact_threshold = compact_threshold
+        self.backups = backups
+        self._journal_lines = 0
+        # 当前快照的代数, 每合并一次快照加一
+        self._generation = 0
+        self.data = self._empty_data()
+        self._executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="gmm-storage")
+        self._pending_ops: List[list] = []
+        self._flush_task: Optional[asyncio.Task] = None
+        self._flush_lock = asyncio.Lock()
+    
+    @staticmethod
+    def _empty_data() -> Dict:
+        return {
+            "bindings": {},  # 格式: {"当前群号": {"target_group": "目标群号", "inactive_months": 6}}
+            "whitelist": {},  # 格式: {群号: Whitelist}
+        }
+    
+    async def load(self):
+        """在存储线程中读取数据"""
+        await asyncio.get_running_loop().run_in_executor(self._executor, self.load_data)
+
+    def load_data(self) -> Dict:
+        """加载数据: 读取快照后重放日志, 快照损坏时使用最新的有效备份
+
+        日志与快照一同轮换, 每个日志以它所接续的快照代数开头;
+        从备份恢复时依次重放该备份之后各代的日志, 缺少某一代时丢弃其后的修改并记录错误。
+        """
+        data = self._empty_data()
+        generation = 0
+        restored = None
+        for path in backup_paths(self.data_file, self.backups):
+            if not path.exists():
+                continue
+            try:
+                with open(path, 'r', encoding='utf-8') as f:
+                    snapshot = json.load(f)
+                bindings = snapshot.get("bindings", {})
+                # 转换whitelist为整数集合
+                whitelist = {
+                    int(k): Whitelist(map(int, v))
+                    for k, v in snapshot.get("whitelist", {}).items()
+                }
+                generation = int(snapshot.get("generation", 0))
+            except Exception as e:
+                logger.error(f"加载数据 {path.name} 失败: {e}")
+                continue
+            if path != self.data_file:
+                restored = path
+            data["bindings"] = bindings
+            data["whitelist"] = whitelist
+            break
+        self.data = data
+        
+        # 代数 -> 日志文件, 同一代以较新的文件为准
+        journals: Dict[int, Path] = {}
+        for i in range(self.backups + 1):
+            path = self._journal_path(i)
+            if path.exists():
+                journals.setdefault(self._journal_generation(path), path)
+        latest = max(journals, default=generation)
+        
+        complete = True
+        self._journal_lines = 0
+        for gen in range(generation, latest + 1):
+            path = journals.get(gen)
+            if path is None:
+                if gen < latest:
+                    logger.error(
+                        f"缺少第 {gen} 代快照之后的修改记录, "
+                        f"第 {gen} 代之后的修改已丢弃"
+                    )
+                    complete = False
+                break
+            self._journal_lines = self._replay_journal(path, truncate=path == self.journal_file)
+        self._generation = max(generation, latest)
+        
+        if restored is not None:
+            if complete:
+                logger.warning(f"数据快照损坏, 已从备份 {restored.name} 恢复并重放之后的修改记录")
+            else:
+                logger.error(f"数据快照损坏, 已从备份 {restored.name} 恢复, 部分修改记录缺失")
+        if restored is not None or not complete:
+            # 立即写入新的快照, 之后不再依赖损坏的快照和不完整的日志
+            snapshot = self._snapshot()
+            snapshot["generation"] = self._generation + 1
+            self._write([], snapshot)
+            self._finish_write([], snapshot)
+        elif self._journal_generation(self.journal_file) != self._generation:
+            # 合并快照后、轮换日志前中断时, 当前日志仍属于上一代
+            self._rotate_journal(self._generation)
+        return data
+    
+    def _journal_path(self, index: int) -> Path:
+        if index == 0:
+            return self.journal_file
+        return self.journal_file.with_name(f"{self.journal_file.name}.{index}")
+    
+    def _journal_generation(self, path: Path) -> int:
+        """读取日志开头记录的快照代数, 没有代数行的日志视为第 0 代"""
+        if not path.exists():
+            return 0
+        with open(path, 'rb') as f:
+            first = f.readline()
+        try:
+            op = json.loads(first)
+        except ValueError:
+            return 0
+        if isinstance(op, list) and op[:1] == ["gen"]:
+            return int(op[1])
+        return 0
+    
+    def _rotate_journal(self, generation: int):
+        """轮换日志, 新日志以所接续的快照代数开头"""
+        if self.backups > 0 and self.journal_file.exists():
+            for i in range(self.backups, 0, -1):
+                older = self._journal_path(i - 1)
+                if older.exists():
+                    os.replace(older, self._journal_path(i))
+        atomic_write(self.journal_file, json.dumps(["gen", generation]) + "\n")
+    
+    def _replay_journal(self, path: Path, truncate: bool = True) -> int:
+        """重放操作日志, 返回有效行数; 末尾写入不完整的行会被忽略, ``truncate`` 时同时截断"""
+        count = 0
+        valid_size = 0
+        with open(path, 'rb') as f:
+            for line in f:
+                try:
+                    if not line.endswith(b"\n"):
+                        raise ValueError("incomplete line")
+                    op = json.loads(line)
+                    if op[:1] != ["gen"]:
+                        self._apply(op)
+                        count += 1
+                except Exception as e:
+                    logger.warning(f"操作日志 {path.name} 第 {count + 1} 行损坏, 已忽略之后的内容: {e}")
+                    break
+                valid_size += len(line)
+        
+        if truncate and valid_size < path.stat().st_size:
+            with open(path, 'r+b') as f:
+                f.truncate(valid_size)
+        return count
+    
+    def _apply(self, op: list):
+        """在内存数据上执行一条操作"""
+        action, *args = op
+        bindings = self.data["bindings"]
+        whitelist = self.data["whitelist"]
+        if action == "bind":
+            current_group, target_group = args
+            bindings[current_group] = {
+                "target_group": target_group,
+                "inactive_months": 6  # 默认6个月
+            }
+        elif action == "unbind":
+            binding = bindings.pop(args[0], None)
+            # 删除对应的白名单
+            if binding is not None:
+                whitelist.pop(int(binding["target_group"]), None)
+        elif action == "months":
+            current_group, months = args
+            if current_group in bindings:
+                bindings[current_group]["inactive_months"] = months
+        elif action == "wl_add":
+            group_id, user_id = int(args[0]), int(args[1])
+            if group_id not in whitelist:
+                whitelist[group_id] = Whitelist()
+            whitelist[group_id].add(user_id)
+        elif action == "wl_del":
+            group_id, user_id = int(args[0]), int(args[1])
+            if group_id in whitelist:
+                whitelist[group_id].discard(user_id)
+        elif action == "wl_add_many":
+            group_id, user_ids = int(args[0]), [int(user_id) for user_id in args[1]]
+            if group_id not in whitelist:
+                whitelist[group_id] = Whitelist()
+            whitelist[group_id].update(user_ids)
+        elif action == "wl_del_many":
+            group_id, user_ids = int(args[0]), args[1]
+            if group_id in whitelist:
+                whitelist[group_id].difference_update(int(user_id) for user_id in user_ids)
+        else:
+            raise ValueError(f"unknown operation {action!r}")
+    
+    def _commit(self, op: list):
+        """执行操作并记入待写日志"""
+        self._apply(op)
+        self._pending_ops.append(op)
+        self._schedule_flush()
+    
+    def _snapshot(self) -> Dict:
+        """复制一份用于序列化的数据, 之后的修改不会影响正在写入的内容"""
+        return {
+            "bindings": {k: dict(v) for k, v in self.data["bindings"].items()},
+            # 转换为list用于JSON序列化
+            "whitelist": {str(k): v.tolist() for k, v in self.data["whitelist"].items()},
+        }
+
+    def _write(self, ops: List[list], snapshot: Optional[Dict]):
+        """写入日志或合并快照(在线程中执行)
+
+        合并快照时操作也先写入当前日志, 使每一代日志完整记录相邻两代快照之间的修改,
+        再写入快照并与日志一同轮换。
+        """
+        if ops:
+            lines = "".join(
+                json.dumps(op, ensure_ascii=False, separators=(",", ":")) + "\n"
+                for op in ops
+            )
+            with open(self.journal_file, 'a', encoding='utf-8') as f:
+                f.write(lines)
+                f.flush()
+                os.fsync(f.fileno())
+        if snapshot is not None:
+            atomic_write(
+                self.data_file,
+                json.dumps(snapshot, ensure_ascii=False, indent=2),
+                backups=self.backups,
+            )
+            self._rotate_journal(snapshot["generation"])
+
+    def _prepare_write(self):
+        """取出待写操作, 日志过长时改为写入完整快照"""
+        ops, self._pending_ops = self._pending_ops, []
+        snapshot = None
+        if self._journal_lines + len(ops) > self.compact_threshold:
+            snapshot = self._snapshot()
+            snapshot["generation"] = self._generation + 1
+        return ops, snapshot
+
+    def _finish_write(self, ops: List[list], snapshot: Optional[Dict]):
+        if snapshot is not None:
+            self._generation = snapshot["generation"]
+            self._journal_lines = 0
+        else:
+            self._journal_lines += len(ops)
+
+    def _schedule_flush(self):
+        """在延迟后合并写入"""
+        if self._flush_task is not None and not self._flush_task.done():
+            return
+        try:
+            loop = asyncio.get_running_loop()
+        except RuntimeError:
+            # 不在事件循环中(如启动前), 直接同步写入
+            ops, snapshot = self._prepare_write()
+            try:
+                self._write(ops, snapshot)
+                self._finish_write(ops, snapshot)
+            except Exception as e:
+                self._pending_ops[:0] = ops
+                logger.error(f"保存数据失败: {e}")
+            return
+        self._flush_task = loop.create_task(self._delayed_flush())
+
+    async def _delayed_flush(self):
+        # 写入期间产生的修改不会另起任务, 由本任务在下一个延迟后继续写入
+        while True:
+            await asyncio.sleep(self.save_delay)
+            await self.save()
+            if not self._pending_ops:
+                return
+
+    async def save(self):
+        """将未保存的修改写入磁盘, 序列化在存储线程中进行"""
+        async with self._flush_lock:
+            if not self._pending_ops:
+                return
+            ops, snapshot = self._prepare_write()
+            try:
+                await asyncio.get_running_loop().run_in_executor(
+                    self._executor, self._write, ops, snapshot
+                )
+                self._finish_write(ops, snapshot)
+            except Exception as e:
+                # 写入失败, 放回队列等待下次写入
+                self._pending_ops[:0] = ops
+                logger.error(f"保存数据失败: {e}")
+    
+    async def bind_group(self, current_group: str, target_group: str) -> bool:
+        """绑定群聊"""
+        self._commit(["bind", current_group, target_group])
+        return True
+    
+    async def unbind_group(self, current_group: str) -> bool:
+        """取消绑定"""
+        if current_group in self.data["bindings"]:
+            self._commit(["unbind", current_group])
+            return True
+        return False
+    
+    async def set_inactive_months(self, current_group: str, months: int) -> bool:
+        """设定不活跃月数"""
+        if current_group in self.data["bindings"]:
+            self._commit(["months", current_group, months])
+            return True
+        return False
+    
+    def get_binding(self, current_group: str) -> Optional[Dict]:
+        """获取绑定信息"""
+        return self.data["bindings"].get(current_group)
+    
+    def iter_bindings(self) -> Iterator[Tuple[str, Dict]]:
+        """遍历所有绑定"""
+        return iter(list(self.data["bindings"].items()))
+    
+    async def add_whitelist(self, group_id: GroupId, user_id: int):
+        """添加白名单"""
+        self._commit(["wl_add", int(group_id), int(user_id)])
+    
+    async def remove_whitelist(self, group_id: GroupId, user_id: int) -> bool:
+        """删除白名单"""
+        if int(user_id) not in self.get_whitelist(group_id):
+            return False
+        self._commit(["wl_del", int(group_id), int(user_id)])
+        return True
+    
+    async def add_whitelist_many(self, group_id: GroupId, user_ids: Iterable[int]) -> List[int]:
+        """批量添加白名单, 记为一条操作"""
+        whitelist = self.get_whitelist(group_id)
+        added = sorted({int(user_id) for user_id in user_ids if int(user_id) not in whitelist})
+        if added:
+            self._commit(["wl_add_many", int(group_id), added])
+        return added
+    
+    async def remove_whitelist_many(self, group_id: GroupId, user_ids: Iterable[int]) -> List[int]:
+        """批量删除白名单, 记为一条操作"""
+        whitelist = self.get_whitelist(group_id)
+        removed = sorted({int(user_id) for user_id in user_ids if int(user_id) in whitelist})
+        if removed:
+            self._commit(["wl_del_many", int(group_id), removed])
+        return removed
+    
+    def get_whitelist(self, group_id: GroupId) -> Whitelist:
+        """获取白名单"""
+        return self.data["whitelist"].get(int(group_id)) or Whitelist()
+    
+    def close(self):
+        self._executor.shutdown(wait=True)
+
+
+class SqliteDataManager(BaseDataManager):
+    """SQLite 存储
+
+    每次修改单独提交, 查询只读取需要的行, 不会把全部数据载入内存。
+    打开数据库、迁移旧数据和所有修改(包括提交时触发的 WAL 检查点)都在一个专用线程中依次执行;
+    查询使用另一个只读连接在事件循环中进行, WAL 模式下读取不会等待正在进行的写入。
+    """
+
+    SCHEMA = """
+    CREATE TABLE IF NOT EXISTS bindings (
+        current_group TEXT PRIMARY KEY,
+        target_group TEXT NOT NULL,
+        inactive_months INTEGER NOT NULL DEFAULT 6
+    );
+    CREATE INDEX IF NOT EXISTS idx_bindings_target ON bindings (target_group);
+    CREATE TABLE IF NOT EXISTS whitelist (
+        group_id INTEGER NOT NULL,
+        user_id INTEGER NOT NULL,
+        PRIMARY KEY (group_id, user_id)
+    ) WITHOUT ROWID;
+    """
+
+    # 把 QQ号 存为 TEXT 的白名单表重建为 INTEGER 列
+    WHITELIST_REBUILD = """
+    ALTER TABLE whitelist RENAME TO whitelist_text;
+    CREATE TABLE whitelist (
+        group_id INTEGER NOT NULL,
+        user_id INTEGER NOT NULL,
+        PRIMARY KEY (group_id, user_id)
+    ) WITHOUT ROWID;
+    INSERT OR IGNORE INTO whitelist
+        SELECT CAST(group_id AS INTEGER), CAST(user_id AS INTEGER) FROM whitelist_text;
+    DROP TABLE whitelist_text;
+    """
+
+    def __init__(self, data_dir: Path):
+        self.data_dir = data_dir
+        self.db_file = data_dir / "data.db"
+        # 写连接只在存储线程中使用, 读连接只在事件循环中使用
+        self.conn: Optional[sqlite3.Connection] = None
+        self.reader: Optional[sqlite3.Connection] = None
+        self._executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="gmm-storage")
+
+    async def _run(self, func, *args):
+        """在存储线程中执行"""
+        return await asyncio.get_running_loop().run_in_executor(self._executor, func, *args)
+
+    async def load(self):
+        await self._run(self._open)
+
+    def _open(self):
+        self.conn = sqlite3.connect(self.db_file, isolation_level=None, check_same_thread=False)
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        self.conn.execute("PRAGMA synchronous=NORMAL")
+        self.conn.executescript(self.SCHEMA)
+        self.migrate_schema()
+        self.migrate_from_json(self.data_dir)
+        # 读连接在存储线程中创建, 之后在事件循环线程中使用
+        self.reader = sqlite3.connect(self.db_file, isolation_level=None, check_same_thread=False)
+        self.reader.execute("PRAGMA query_only=ON")
+
+    def migrate_schema(self):
+        """``CREATE TABLE IF NOT EXISTS`` 不会修改已有的表, 列类型不同时在一个事务中重建"""
+        columns = {
+            name: column_type.upper()
+            for _, name, column_type, *_ in self.conn.execute("PRAGMA table_info(whitelist)")
+        }
+        if columns.get("user_id") == "INTEGER" and columns.get("group_id") == "INTEGER":
+            return
+        self.conn.executescript("BEGIN;" + self.WHITELIST_REBUILD + "COMMIT;")
+        logger.info("已将白名单表的QQ号列转换为 INTEGER 类型")
+
+    def migrate_from_json(self, data_dir: Path):
+        """从 JSON 存储一次性迁移数据, 迁移后原文件加上 .migrated 后缀"""
+        json_manager = DataManager(data_dir)
+        if not json_manager.data_file.exists() and not json_manager.journal_file.exists():
+            return
+        if self.conn.execute("SELECT 1 FROM bindings LIMIT 1").fetchone():
+            logger.warning("SQLite 数据库已有数据, 跳过 JSON 数据迁移")
+            return
+
+        data = json_manager.load_data()
+        with self.conn:
+            self.conn.execute("BEGIN")
+            self.conn.executemany(
+                "INSERT OR REPLACE INTO bindings VALUES (?, ?, ?)",
+                (
+                    (current_group, binding["target_group"], binding.get("inactive_months", 6))
+                    for current_group, binding in data["bindings"].items()
+                ),
+            )
+            self.conn.executemany(
+                "INSERT OR IGNORE INTO whitelist VALUES (?, ?)",
+                (
+                    (int(group_id), int(user_id))
+                    for group_id, users in data["whitelist"].items()
+                    for user_id in users
+                ),
+            )
+
+        for path in (json_manager.data_file, json_manager.journal_file):
+            if path.exists():
+                path.rename(path.with_name(path.name + ".migrated"))
+        logger.info(f"已将 {len(data['bindings'])} 条绑定从 JSON 迁移到 SQLite")
+
+    async def bind_group(self, current_group: str, target_group: str) -> bool:
+        """绑定群聊"""
+        return await self._run(self._bind_group, current_group, target_group)
+
+    def _bind_group(self, current_group: str, target_group: str) -> bool:
+        self.conn.execute(
+            "INSERT OR REPLACE INTO bindings VALUES (?, ?, 6)",  # 默认6个月
+            (current_group, target_group),
+        )
+        return True
+
+    async def unbind_group(self, current_group: str) -> bool:
+        """取消绑定"""
+        return await self._run(self._unbind_group, current_group)
+
+    def _unbind_group(self, current_group: str) -> bool:
+        row = self.conn.execute(
+            "SELECT target_group FROM bindings WHERE current_group = ?", (current_group,)
+        ).fetchone()
+        if row is None:
+            return False
+        with self.conn:
+            self.conn.execute("BEGIN")
+            self.conn.execute("DELETE FROM bindings WHERE current_group = ?", (current_group,))
+            # 删除对应的白名单
+            self.conn.execute("DELETE FROM whitelist WHERE group_id = ?", (int(row[0]),))
+        return True
+
+    async def set_inactive_months(self, current_group: str, months: int) -> bool:
+        """设定不活跃月数"""
+        return await self._run(self._set_inactive_months, current_group, months)
+
+    def _set_inactive_months(self, current_group: str, months: int) -> bool:
+        cursor = self.conn.execute(
+            "UPDATE bindings SET inactive_months = ? WHERE current_group = ?",
+            (months, current_group),
+        )
+        return cursor.rowcount > 0
+
+    def get_binding(self, current_group: str) -> Optional[Dict]:
+        """获取绑定信息"""
+        row = self.reader.execute(
+            "SELECT target_group, inactive_months FROM bindings WHERE current_group = ?",
+            (current_group,),
+        ).fetchone()
+        if row is None:
+            return None
+        return {"target_group": row[0], "inactive_months": row[1]}
+
+    def iter_bindings(self) -> Iterator[Tuple[str, Dict]]:
+        """遍历所有绑定"""
+        rows = self.reader.execute(
+            "SELECT current_group, target_group, inactive_months FROM bindings"
+        ).fetchall()
+        for current_group, target_group, inactive_months in rows:
+            yield current_group, {"target_group": target_group, "inactive_months": inactive_months}
+
+    async def add_whitelist(self, group_id: GroupId, user_id: int):
+        """添加白名单"""
+        await self.add_whitelist_many(group_id, [user_id])
+
+    async def remove_whitelist(self, group_id: GroupId, user_id: int) -> bool:
+        """删除白名单"""
+        return bool(await self.remove_whitelist_many(group_id, [user_id]))
+
+    async def add_whitelist_many(self, group_id: GroupId, user_ids: Iterable[int]) -> List[int]:
+        """批量添加白名单, 在一个事务中提交"""
+        return await self._run(self._add_whitelist_many, int(group_id), {int(user_id) for user_id in user_ids})
+
+    def _current_whitelist(self, group_id: int) -> Whitelist:
+        rows = self.conn.execute("SELECT user_id FROM whitelist WHERE group_id = ?", (group_id,))
+        return Whitelist(user_id for user_id, in rows)
+
+    def _add_whitelist_many(self, group_id: int, user_ids: Set[int]) -> List[int]:
+        whitelist = self._current_whitelist(group_id)
+        added = sorted(user_id for user_id in user_ids if user_id not in whitelist)
+        with self.conn:
+            self.conn.execute("BEGIN")
+            self.conn.executemany(
+                "INSERT OR IGNORE INTO whitelist VALUES (?, ?)",
+                ((group_id, user_id) for user_id in added),
+            )
+        return added
+
+    async def remove_whitelist_many(self, group_id: GroupId, user_ids: Iterable[int]) -> List[int]:
+        """批量删除白名单, 在一个事务中提交"""
+        return await self._run(self._remove_whitelist_many, int(group_id), {int(user_id) for user_id in user_ids})
+
+    def _remove_whitelist_many(self, group_id: int, user_ids: Set[int]) -> List[int]:
+        whitelist = self._current_whitelist(group_id)
+        removed = sorted(user_id for user_id in user_ids if user_id in whitelist)
+        with self.conn:
+            self.conn.execute("BEGIN")
+            self.conn.executemany(
+                "DELETE FROM whitelist WHERE group_id = ? AND user_id = ?",
+                ((group_id, user_id) for user_id in removed),
+            )
+        return removed
+
+    def get_whitelist(self, group_id: GroupId) -> Whitelist:
+        """获取白名单"""
+        rows = self.reader.execute(
+            "SELECT user_id FROM whitelist WHERE group_id = ?", (int(group_id),)
+        )
+        return Whitelist(user_id for user_id, in rows)
+
+    def close(self):
+        self._executor.shutdown(wait=True)
+        for conn in (self.reader, self.conn):
+            if conn is not None:
+                conn.close()
+
+
+def create_data_manager(data_dir: Path, config) -> BaseDataManager:
+    """根据配置创建存储后端"""
+    if config.gmm_storage == "sqlite":
+        return SqliteDataManager(data_dir)
+    return DataManager(
+        data_dir,
+        config.gmm_save_delay,
+        config.gmm_journal_compact_threshold,
+        config.gmm_snapshot_backups,
+    )